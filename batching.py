@@ -0,0 +1,81 @@
+import math
+import hashlib
+
+from validator import is_valid
+
+
+# a converted tree is roughly this many times longer than its text
+OUTPUT_RATIO = 10
+# keep the expected answer well inside the model's output limit,
+# reasoning tokens come out of the same budget
+BATCH_MAX_OUTPUT_TOKENS = 8000
+BATCH_MAX_ITEMS = 10
+
+
+def estimate_tokens(text:str) -> int:
+    # ~4 characters per token is close enough for sizing batches
+    return math.ceil(len(text) / 4)
+
+
+def text_id(text:str) -> str:
+    # stable across runs and batch orderings
+    return "T" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:8]
+
+
+def make_batches(texts:list[str], max_items:int = BATCH_MAX_ITEMS,
+                 max_tokens:int = BATCH_MAX_OUTPUT_TOKENS) -> list[list[str]]:
+    # Greedily pack texts in order. A text that is too big on its own still gets a batch.
+    batches: list[list[str]] = []
+    batch: list[str] = []
+    tokens = 0
+    for text in texts:
+        cost = estimate_tokens(text) * OUTPUT_RATIO
+        if batch and (len(batch) >= max_items or tokens + cost > max_tokens):
+            batches.append(batch)
+            batch, tokens = [], 0
+        batch.append(text)
+        tokens += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def build_batch_prompt(batch:list[str]) -> str:
+    items = "\n\n".join(f"[{text_id(text)}]\n{text}" for text in batch)
+    return (
+        "Convert each of the following prerequisite texts to JSON as per the instructions. "
+        "Each text is preceded by its ID in square brackets. "
+        "Output a single JSON object that maps every ID to that text's converted object "
+        '(the object with the "prerequisites" key). Only output the JSON.\n\n'
+        f"Texts:\n{items}"
+    )
+
+
+def parse_batch(result:object, batch:list[str]) -> tuple[dict[str, dict], list[str]]:
+    # Split a keyed multi-result response into finished conversions and texts to re-queue.
+    # Items that fail schema validation are re-queued too.
+    done: dict[str, dict] = {}
+    missing: list[str] = []
+    if not isinstance(result, dict):
+        return done, list(batch)
+    for text in batch:
+        item = result.get(text_id(text))
+        if is_valid(item):
+            done[text] = item  # type: ignore
+        else:
+            missing.append(text)
+    return done, missing
+
+
+if __name__ == "__main__":
+    from data.text import prerequisites
+
+    with open("instructions.md", "r", encoding="utf-8") as f:
+        system = estimate_tokens(f.read())
+    texts = list(prerequisites)
+    single = sum(system + estimate_tokens(text) + 30 for text in texts)
+    batches = make_batches(texts)
+    batched = sum(system + estimate_tokens(build_batch_prompt(batch)) for batch in batches)
+    print(f"Estimated input tokens for a full re-conversion of {len(texts)} texts:")
+    print(f"  one per request: {len(texts)} requests, {single:,} tokens")
+    print(f"  batched:         {len(batches)} requests, {batched:,} tokens ({single / batched:.1f}x fewer)")
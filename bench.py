@@ -0,0 +1,69 @@
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import convert
+from client import OpenRouterClient
+from metrics import Metrics, percentile
+from mockserver import start_server, server_url, add_arguments, mock_from_args
+
+
+# Offline benchmark of the conversion pipeline against mockserver.py.
+# Fast path, templates and the response cache are off so every text costs a request.
+
+
+async def run_pipeline(texts:list[str], instructions:str, concurrency:int, batch_size:int) -> int:
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency + 1))
+    converted = 0
+    async for _, responses, _ in convert.convert_all(texts, instructions, concurrency, batch_size,
+                                                  fastpath=False, templates=None):
+        if responses:
+            converted += 1
+    return converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the conversion pipeline against a mock OpenRouter server.")
+    parser.add_argument("-n", "--texts", type=int, default=200, help="number of texts to convert")
+    parser.add_argument("-j", "--concurrency", type=int, default=convert.CONCURRENCY)
+    parser.add_argument("-b", "--batch", type=int, default=1)
+    parser.add_argument("--backoff-base", type=float, default=1, help="client backoff base in seconds")
+    parser.add_argument("--stream", action="store_true", help="stream responses and validate them as they arrive")
+    parser.add_argument("--metrics", default=".cache/bench_metrics.jsonl", help="where to write per-call metrics")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    mock = mock_from_args(args)
+    server = start_server(mock)
+    convert.client = OpenRouterClient("mock", url=server_url(server), pool_size=args.concurrency,
+                                      backoff_base=args.backoff_base)
+    convert.cache = None
+    convert.STREAM = args.stream
+    # keep benchmark calls out of the real metrics file
+    convert.metrics = Metrics(args.metrics)
+
+    texts = list(mock.answers)[:args.texts]
+    start = time.perf_counter()
+    converted = asyncio.run(run_pipeline(texts, convert.load_instructions(), args.concurrency, args.batch))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    print(f"Converted {converted}/{len(texts)} texts in {elapsed:.1f}s "
+          f"(concurrency {args.concurrency}, batch {args.batch}, latency {args.latency}).")
+    print(f"Throughput: {converted / elapsed * 60:.1f} conversions/min")
+    latencies = [call["wall"] for call in convert.metrics.calls]
+    print(f"Request latency: p50 {percentile(latencies, 50):.2f}s, p95 {percentile(latencies, 95):.2f}s over {len(latencies)} requests")
+    ttfts = [call["ttft"] for call in convert.metrics.calls if call.get("ttft") is not None]
+    if ttfts:
+        print(f"Time to first token: p50 {percentile(ttfts, 50):.2f}s, p95 {percentile(ttfts, 95):.2f}s")
+    aborted = [call for call in convert.metrics.calls if call["status"] == "diverged"]
+    if aborted:
+        print(f"Aborted {len(aborted)} streams after a median {percentile([c['wall'] for c in aborted], 50):.2f}s")
+    print(f"Retries: {convert.client.retries}")
+    print(mock.stats())
+
+
+if __name__ == "__main__":
+    main()
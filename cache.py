@@ -0,0 +1,86 @@
+import os
+import json
+import hashlib
+import threading
+
+
+CACHE_DIR = ".cache/responses"
+# evict least recently used entries once the cache grows past this
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def cache_key(model:str, instructions:str, reasoning:object, text:str) -> str:
+    blob = json.dumps([model, instructions, reasoning, text], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    # Content-addressed store of raw LLM responses, one file per key,
+    # sharded by the first two hex digits. Access time is tracked with mtime.
+
+    def __init__(self, path:str = CACHE_DIR, max_bytes:int = CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        self.size = sum(os.path.getsize(p) for p in self.entries())
+
+    def entries(self) -> list[str]:
+        paths = []
+        for shard in os.listdir(self.path):
+            shard_path = os.path.join(self.path, shard)
+            if os.path.isdir(shard_path):
+                paths.extend(os.path.join(shard_path, name) for name in os.listdir(shard_path) if name.endswith(".json"))
+        return paths
+
+    def file(self, key:str) -> str:
+        return os.path.join(self.path, key[:2], key + ".json")
+
+    def get(self, key:str) -> str | None:
+        path = self.file(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                raw = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return raw
+
+    def put(self, key:str, raw:str):
+        path = self.file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(raw)
+        os.replace(tmp, path)
+        with self.lock:
+            self.size += os.path.getsize(path) - old_size
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        # drop oldest entries until we're comfortably under the limit
+        target = self.max_bytes * 0.9
+        for path in sorted(self.entries(), key=os.path.getmtime):
+            if self.size <= target:
+                break
+            size = os.path.getsize(path)
+            os.remove(path)
+            self.size -= size
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0
+        return f"Cache: {self.hits}/{total} hits ({rate:.1f}%), {self.size / 1024 / 1024:.1f} MB on disk."
+
+
+if __name__ == "__main__":
+    cache = ResponseCache()
+    print(f"{len(cache.entries())} cached responses, {cache.size / 1024 / 1024:.1f} MB in {cache.path}")
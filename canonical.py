@@ -0,0 +1,96 @@
+import json
+
+from nodes import Node, from_json, load_converted, PrerequisiteGroup, ContentScoreRequirement
+
+
+# Canonical, hash-consed prerequisite trees. Nested groups with the same logic are
+# flattened, children are deduplicated and sorted, and single-child groups collapse,
+# so trees that mean the same thing come out as the same object. Every distinct
+# subtree is stored once, which makes equality an `is` check.
+
+
+class Interner:
+
+    def __init__(self):
+        # (class, fields with interned children replaced by their id) -> the one shared node
+        self.table: dict[tuple, Node] = {}
+        # id(node) -> deterministic sort key for ordering children
+        self.keys: dict[int, str] = {}
+
+    def intern(self, node):
+        if isinstance(node, PrerequisiteGroup):
+            children: list = []
+            seen: set[int] = set()
+            for child in node.children:
+                child = self.intern(child)
+                same_logic = isinstance(child, PrerequisiteGroup) and child.logic == node.logic
+                for part in (child.children if same_logic else (child,)):
+                    if id(part) not in seen:
+                        seen.add(id(part))
+                        children.append(part)
+            if len(children) == 1:
+                return children[0]
+            children.sort(key=lambda c: self.keys[id(c)])
+            lookup = (PrerequisiteGroup, node.logic, tuple(id(c) for c in children))
+            found = self.table.get(lookup)
+            if found is None:
+                found = PrerequisiteGroup(node.logic, tuple(children))
+                key = f"{node.logic}({','.join(self.keys[id(c)] for c in children)})"
+        elif isinstance(node, ContentScoreRequirement):
+            content, score = self.intern(node.content), self.intern(node.score)
+            lookup = (ContentScoreRequirement, id(content), id(score))
+            found = self.table.get(lookup)
+            if found is None:
+                found = ContentScoreRequirement(content, score)
+                key = f"R({self.keys[id(content)]},{self.keys[id(score)]})"
+        else:
+            # leaves are small, hashing them directly is cheap
+            lookup = (type(node), node)
+            found = self.table.get(lookup)
+            if found is None:
+                found = node
+                key = json.dumps(node.to_json(), sort_keys=True, ensure_ascii=False)
+        if lookup not in self.table:
+            self.table[lookup] = found
+            self.keys[id(found)] = key
+        return found
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+
+interner = Interner()
+
+
+def canonical(node:Node | None) -> Node | None:
+    return None if node is None else interner.intern(node)
+
+
+def equivalent(a:dict, b:dict) -> bool:
+    # whether two conversions mean the same thing, regardless of ordering and grouping
+    return canonical(from_json(a)) is canonical(from_json(b))
+
+
+def count_nodes(node) -> int:
+    if isinstance(node, PrerequisiteGroup):
+        return 1 + sum(count_nodes(c) for c in node.children)
+    if isinstance(node, ContentScoreRequirement):
+        return 3
+    return 1
+
+
+if __name__ == "__main__":
+    import time
+
+    trees = load_converted()
+    start = time.perf_counter()
+    canon = {text: canonical(tree) for text, tree in trees.items()}
+    elapsed = time.perf_counter() - start
+
+    total = sum(count_nodes(tree) for tree in trees.values() if tree is not None)
+    distinct = len({id(tree) for tree in canon.values()})
+    reordered = sum(1 for text, tree in trees.items() if tree is not None and canon[text] != tree)
+    print(f"Canonicalized {len(trees)} conversions in {elapsed * 1000:.1f}ms.")
+    print(f"{total:,} nodes as loaded, {len(interner):,} distinct nodes after hash-consing "
+          f"({total / len(interner):.1f}x sharing).")
+    print(f"{distinct} distinct prerequisite trees, {reordered} conversions changed by flattening, sorting or dedup.")
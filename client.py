@@ -0,0 +1,130 @@
+import os
+import time
+import random
+import threading
+import email.utils
+import requests
+from requests.adapters import HTTPAdapter
+
+
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+# statuses worth waiting out, everything else is our fault
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def parse_retry_after(value:str | None) -> float | None:
+    # Retry-After is either a number of seconds or an http date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class OpenRouterClient:
+    # One pooled keep-alive session shared by every worker thread, with
+    # timeouts, jittered exponential backoff and fallback models.
+
+    def __init__(self, api_key:str | None, url:str = OPENROUTER_URL, pool_size:int = 16,
+                 connect_timeout:float = 10, read_timeout:float = 300, deadline:float = 900,
+                 max_retries:int = 5, backoff_base:float = 1, backoff_max:float = 60):
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # total retries across all threads, for reporting
+        self.retries = 0
+        self.lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+
+    def backoff(self, attempt:int) -> float:
+        # "full jitter": anywhere between 0 and the exponential cap
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def post(self, payload:dict, deadline:float | None = None, stats:dict | None = None) -> requests.Response:
+        # POST with retries until it succeeds, fails for good, or runs out of time.
+        # `deadline` is an absolute time.monotonic() value, retries are counted into `stats`.
+        # Streamed requests return as soon as the headers are in, the caller reads the body.
+        if deadline is None:
+            deadline = time.monotonic() + self.deadline
+
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"Gave up on {payload.get('model')} after {attempt} attempts.")
+
+            wait = None
+            try:
+                response = self.session.post(
+                    self.url, json=payload, stream=bool(payload.get("stream")),
+                    timeout=(min(self.connect_timeout, remaining), min(self.read_timeout, remaining))
+                )
+                if response.status_code == 200:
+                    return response
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    print(f"Error: Received status code {response.status_code}")
+                    print(f"Response content: {response.content[:500]!r}")
+                    response.raise_for_status()
+                    return response
+                wait = parse_retry_after(response.headers.get("Retry-After"))
+                # a streamed response holds its pooled connection until closed
+                response.close()
+                print(f"Status {response.status_code} from {payload.get('model')}, retrying.")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                print(f"{type(e).__name__} from {payload.get('model')}, retrying.")
+
+            if wait is None:
+                wait = self.backoff(attempt)
+            if time.monotonic() + wait >= deadline:
+                raise DeadlineExceeded(f"Gave up on {payload.get('model')} after {attempt + 1} attempts.")
+            with self.lock:
+                self.retries += 1
+            if stats is not None:
+                stats["retries"] = stats.get("retries", 0) + 1
+            time.sleep(wait)
+            attempt += 1
+
+    def chat(self, payload:dict, models:list[str], stats:dict | None = None) -> tuple[str, requests.Response]:
+        # Try each model in turn, moving on once the previous one has used up its retries
+        # or its share of the overall deadline, so a slow first model still leaves time for
+        # the fallbacks (time a model doesn't use goes to the ones after it).
+        # Returns the model that answered.
+        deadline = time.monotonic() + self.deadline
+        error: Exception | None = None
+        for n, model in enumerate(models):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                return model, self.post({**payload, "model": model}, time.monotonic() + remaining / (len(models) - n),
+                                        stats)
+            except (DeadlineExceeded, requests.RequestException) as e:
+                print(f"Falling back from {model}: {e}")
+                error = e
+        if error is None:
+            raise DeadlineExceeded(f"No time left to try {', '.join(models)}.")
+        raise error
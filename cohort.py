@@ -0,0 +1,291 @@
+import time
+import random
+
+import numpy as np
+
+from nodes import (PrerequisiteGroup, ContentScoreRequirement, ContentCollegeCourse, ContentOtherCourse, ContentExam,
+                   ContentCollegeCredits, ContentCollegeCompletedCourses)
+from eligibility import (NO, MANUAL, YES, DEFAULT_CREDITS, Transcript, load_catalog, eligibility, random_transcript,
+                         meets_grade, meets_value, passed, normalize)
+
+
+# Eligibility for a whole cohort at once. Transcripts are encoded into integer
+# matrices (students x courses, exams, high school courses), each distinct value
+# getting a small integer code. Every canonical subtree of the catalog is lowered
+# into one vectorized step: leaves look their result up in a table indexed by
+# those codes, groups are a min (AND) or max (OR) over their children's rows.
+# The lookup tables come from the same functions eligibility.py uses, so the two
+# engines agree. Credits and transferability are per student, like everything else
+# on a transcript, so they are matrices too.
+
+# students evaluated together, bounds the size of the intermediate rows
+CHUNK = 8192
+MISSING = 0
+
+
+class Cohort:
+    # the encoded transcripts, stored feature-major (courses x students and so on)
+    # so each vectorized step reads contiguous memory
+
+    def __init__(self, grades:np.ndarray, in_progress:np.ndarray, credits:np.ndarray, transferable:np.ndarray,
+                 exams:np.ndarray, high_school:np.ndarray):
+        self.grades = grades
+        self.in_progress = in_progress
+        # credits are whole or half numbers, exact in float16 at half the memory of float32
+        self.credits = credits
+        self.transferable = transferable
+        self.exams = exams
+        self.high_school = high_school
+
+    def __len__(self) -> int:
+        return self.grades.shape[1]
+
+
+class CohortProgram:
+
+    def __init__(self, catalog:list[tuple[str, object]]):
+        self.courses = [course for course, _ in catalog]
+        self.ops: list[tuple] = []
+        self.index: dict[int, int] = {}  # id(canonical node) -> row
+        self.roots = [None if tree is None else self.lower(tree) for _, tree in catalog]
+
+        # columns, extended with whatever else shows up in transcripts when encoding
+        self.course_cols: dict[str, int] = {}
+        self.exam_cols: dict[str, int] = {}
+        self.high_school_cols: dict[str, int] = {}
+        for op in self.ops:
+            if op[0] == "course":
+                self.column(self.course_cols, op[2])
+            elif op[0] == "exam":
+                self.column(self.exam_cols, op[2])
+            elif op[0] == "high_school":
+                self.column(self.high_school_cols, op[2])
+        # value codes, 0 is MISSING
+        self.grade_codes: dict[str, int] = {}
+        self.value_codes: dict[object, int] = {}
+
+    def column(self, cols:dict[str, int], name:str) -> int:
+        if name not in cols:
+            cols[name] = len(cols)
+        return cols[name]
+
+    def code(self, codes:dict, value:object) -> int:
+        if value not in codes:
+            codes[value] = len(codes) + 1
+        return codes[value]
+
+    def lower(self, node) -> int:
+        # -> the row holding this subtree's result, shared subtrees are lowered once
+        row = self.index.get(id(node))
+        if row is not None:
+            return row
+        if isinstance(node, PrerequisiteGroup):
+            children = [self.lower(child) for child in node.children]
+            op = ("and" if node.logic == "AND" else "or", children)
+        elif isinstance(node, ContentScoreRequirement):
+            content, score = node.content, node.score
+            if isinstance(content, ContentCollegeCourse):
+                op = ("course", score, f"{content.subject} {content.course_code}", content.can_be_taken_concurrently)
+            elif isinstance(content, ContentExam):
+                op = ("exam", score, normalize(content.exam))
+            elif isinstance(content, ContentOtherCourse):
+                op = ("high_school", score, normalize(content.course))
+            elif isinstance(content, (ContentCollegeCredits, ContentCollegeCompletedCourses)):
+                op = ("aggregate", score, content)
+            else:
+                op = ("const", MANUAL)
+        else:
+            op = ("const", MANUAL)
+        self.ops.append(op)
+        self.index[id(node)] = len(self.ops) - 1
+        return len(self.ops) - 1
+
+    def encode(self, transcripts:list[Transcript]) -> Cohort:
+        for transcript in transcripts:
+            for course in transcript.courses:
+                self.column(self.course_cols, course)
+        n = len(transcripts)
+        grades = np.zeros((len(self.course_cols), n), np.int16)
+        in_progress = np.zeros((len(self.course_cols), n), bool)
+        credits = np.full((len(self.course_cols), n), DEFAULT_CREDITS, np.float16)
+        transferable = np.ones((len(self.course_cols), n), bool)
+        exams = np.zeros((len(self.exam_cols), n), np.int16)
+        high_school = np.zeros((len(self.high_school_cols), n), np.int16)
+        for i, transcript in enumerate(transcripts):
+            for course, grade in transcript.courses.items():
+                grades[self.course_cols[course], i] = self.code(self.grade_codes, grade)
+            for course in transcript.in_progress:
+                if course in self.course_cols:
+                    in_progress[self.course_cols[course], i] = True
+            # only courses on the transcript count towards aggregates, and those all have a column
+            for course, value in transcript.credits.items():
+                if course in transcript.courses:
+                    credits[self.course_cols[course], i] = value
+            for course in transcript.non_transferable:
+                if course in transcript.courses:
+                    transferable[self.course_cols[course], i] = False
+            for name, value in transcript.exam_scores.items():
+                if name in self.exam_cols:
+                    exams[self.exam_cols[name], i] = self.code(self.value_codes, value)
+            for name, value in transcript.high_school_grades.items():
+                if name in self.high_school_cols:
+                    high_school[self.high_school_cols[name], i] = self.code(self.value_codes, value)
+        return Cohort(grades, in_progress, credits, transferable, exams, high_school)
+
+    def tables(self) -> list:
+        # per op, the result for every value code (index 0 is MISSING)
+        grades = list(self.grade_codes)
+        values = list(self.value_codes)
+        memo: dict[tuple, np.ndarray] = {}
+        tables = []
+        for op in self.ops:
+            kind = op[0]
+            key = (kind, id(op[1])) if kind in ("course", "exam", "high_school", "aggregate") else None
+            if key is None:
+                tables.append(None)
+                continue
+            if key not in memo:
+                score = op[1]
+                if kind == "course":
+                    table = [NO] + [meets_grade(g, score) for g in grades]
+                elif kind == "aggregate":
+                    # failed courses don't count towards credits at all
+                    table = [NO] + [meets_grade(g, score) if passed(g) else NO for g in grades]
+                else:
+                    table = [NO] + [meets_value(v, score) for v in values]
+                memo[key] = np.array(table, np.int8)
+            tables.append(memo[key])
+        return tables
+
+    def aggregate_mask(self, content) -> np.ndarray:
+        # which course columns match an aggregate's subject and year filters
+        subjects = None if content.subjects is None else {s.upper() for s in content.subjects}
+        mask = np.zeros(len(self.course_cols), np.float32)
+        for course, col in self.course_cols.items():
+            subject, _, code = course.partition(" ")
+            level = int(code[0]) if code[:1].isdigit() else 0
+            if subjects is not None and subject not in subjects:
+                continue
+            if content.year is not None and level != content.year:
+                continue
+            mask[col] = 1
+        return mask
+
+    def aggregate_groups(self, tables:list) -> list[tuple[np.ndarray, list[int], np.ndarray, np.ndarray, bool, bool]]:
+        # Aggregates sharing a score and what they count (credits or courses, transferable
+        # or not) share one lookup, then a single matrix product sums every aggregate's
+        # matching credits or courses for every student.
+        # -> (table, op rows, courses x aggregates mask, amount needed, counts credits, transferable only) per group
+        by_kind: dict[tuple[int, bool, bool], list[int]] = {}
+        for i, op in enumerate(self.ops):
+            if op[0] == "aggregate":
+                content = op[2]
+                key = (id(op[1]), isinstance(content, ContentCollegeCredits), bool(content.university_transferable))
+                by_kind.setdefault(key, []).append(i)
+        groups = []
+        for (_, counts_credits, transferable_only), rows in by_kind.items():
+            mask = np.stack([self.aggregate_mask(self.ops[i][2]) for i in rows], axis=1)
+            needed = np.array([op[2].credits if counts_credits else op[2].count
+                               for op in (self.ops[i] for i in rows)], np.float32)
+            groups.append((tables[rows[0]], rows, mask, needed, counts_credits, transferable_only))
+        return groups
+
+    def run(self, cohort:Cohort) -> np.ndarray:
+        # -> students x courses matrix of NO / MANUAL / YES, courses in catalog order
+        if cohort.grades.shape[0] != len(self.course_cols):
+            raise ValueError("Cohort was encoded before later transcripts added courses, encode it again.")
+        tables = self.tables()
+        groups = self.aggregate_groups(tables)
+        result = np.full((len(cohort), len(self.courses)), YES, np.int8)
+        for start in range(0, len(cohort), CHUNK):
+            end = min(start + CHUNK, len(cohort))
+            rows = self.run_chunk(cohort, start, end, tables, groups)
+            for j, root in enumerate(self.roots):
+                if root is not None:
+                    result[start:end, j] = rows[root]
+        return result
+
+    def run_chunk(self, cohort:Cohort, start:int, end:int, tables:list, groups:list) -> np.ndarray:
+        grades = cohort.grades[:, start:end]
+        rows = np.empty((len(self.ops), end - start), np.int8)
+        for table, group_rows, mask, needed, counts_credits, transferable_only in groups:
+            matched = table[grades]
+            # what each passed course adds: its credits or 1, 0 where it doesn't transfer
+            counted = (matched == YES).astype(np.float32)
+            if counts_credits:
+                counted *= cohort.credits[:, start:end]
+            if transferable_only:
+                counted *= cohort.transferable[:, start:end]
+            totals = mask.T @ counted
+            results = np.where(totals >= needed[:, None], YES, NO).astype(np.int8)
+            if (table == MANUAL).any():
+                manual = matched == MANUAL
+                if transferable_only:
+                    manual &= cohort.transferable[:, start:end]
+                results[(mask.T @ manual.astype(np.float32)) > 0] = MANUAL
+            rows[group_rows] = results
+
+        for i, op in enumerate(self.ops):
+            kind = op[0]
+            if kind == "and":
+                rows[i] = rows[op[1]].min(axis=0)
+            elif kind == "or":
+                rows[i] = rows[op[1]].max(axis=0)
+            elif kind == "course":
+                col = self.course_cols[op[2]]
+                rows[i] = tables[i][grades[col]]
+                if op[3]:
+                    # registered this term, whatever grade an earlier attempt got
+                    rows[i][cohort.in_progress[col, start:end]] = YES
+            elif kind == "exam":
+                rows[i] = tables[i][cohort.exams[self.exam_cols[op[2]], start:end]]
+            elif kind == "high_school":
+                rows[i] = tables[i][cohort.high_school[self.high_school_cols[op[2]], start:end]]
+            elif kind == "const":
+                rows[i] = op[1]
+        return rows
+
+
+if __name__ == "__main__":
+    catalog = load_catalog()
+    program = CohortProgram(catalog)
+    print(f"Lowered {len(catalog)} courses into {len(program.ops)} vectorized steps.")
+
+    rng = random.Random(0)
+    for size in (10_000, 100_000):
+        transcripts = [random_transcript(catalog, rng) for _ in range(size)]
+        start = time.perf_counter()
+        cohort = program.encode(transcripts)
+        encoded = time.perf_counter() - start
+        start = time.perf_counter()
+        result = program.run(cohort)
+        elapsed = time.perf_counter() - start
+        print(f"{size:,} students: encoded in {encoded:.2f}s, evaluated {result.size:,} student-course pairs "
+              f"in {elapsed:.2f}s ({elapsed / size * 1e6:.1f}us per student).")
+
+        # spot check against the tree-walking engine
+        sample = rng.sample(range(size), 200)
+        start = time.perf_counter()
+        for i in sample:
+            expected = eligibility(transcripts[i], catalog)
+            assert [expected[c] for c in program.courses] == result[i].tolist(), f"student {i} disagrees"
+        walked = (time.perf_counter() - start) / len(sample)
+        print(f"  matches eligibility.py on {len(sample)} sampled students, "
+              f"which would take ~{walked * size:.1f}s for the cohort.")
+
+    # random_transcript never sets credits or transferability, which differ from student to student
+    english = [course for course in program.courses if course.startswith("ENGL ")][:30]
+    students = [Transcript(courses={course: "A" for course in english}, non_transferable=set(english)),
+                Transcript(courses={course: "A" for course in english})]
+    for _ in range(2000):
+        transcript = random_transcript(catalog, rng, courses=40)
+        taken = list(transcript.courses)
+        transcript.credits = {course: rng.choice([0, 1, 1.5, 4, 5]) for course in rng.sample(taken, 10)}
+        transcript.non_transferable = set(rng.sample(taken, rng.randint(0, 20)))
+        transcript.refresh()
+        students.append(transcript)
+    result = program.run(program.encode(students))
+    for i, transcript in enumerate(students):
+        expected = eligibility(transcript, catalog)
+        assert [expected[c] for c in program.courses] == result[i].tolist(), f"student {i} with credits disagrees"
+    print(f"  matches eligibility.py on {len(students)} students with their own credits and transferability.")
@@ -1,9 +1,26 @@
 import os
 import json
-import requests
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 from helpers import print_human_readable
+from client import OpenRouterClient
+from cache import ResponseCache, cache_key
+from journal import Journal
+from batching import make_batches, build_batch_prompt, parse_batch
+from fastpath import parse_prerequisite
+from templates import TemplateIndex
+from review_queue import ReviewQueue
+from metrics import Metrics, usage_fields
+from streaming import StreamValidator, StreamDiverged, read_stream
+from validator import validate, is_valid
+from nodes import from_json
+from canonical import canonical, equivalent
+from neardup import NearDupIndex, token_diff
+from prompt import PromptBuilder
 
 load_dotenv()
 
@@ -17,70 +34,381 @@ OUTPUT_PATH = "data/converted.json"
 MODEL_1 = "google/gemini-2.5-pro"
 MODEL_2 = "mistralai/mistral-7b-instruct:free"
 MODEL = MODEL_1
+# models to fall back to, in order, when the first one keeps failing
+FALLBACK_MODELS = [MODEL_2]
+REASONING = {
+    "effort": "high",
+    "exclude": False,
+}
+# how many requests to keep in flight at once
+CONCURRENCY = 8
+# how many times a batch can come back incomplete before its leftovers go one at a time
+BATCH_RETRIES = 2
+# stream responses and abort ones that stop looking like a valid conversion
+STREAM = False
+
+client = OpenRouterClient(OPENROUTER_API_KEY, pool_size=CONCURRENCY)
+cache: ResponseCache | None = ResponseCache()
+journal = Journal(OUTPUT_PATH)
+review_queue = ReviewQueue()
+metrics = Metrics()
+# near-duplicate texts, so review can offer the closest approved conversion
+neardups: NearDupIndex | None = None
+# when set, single-text calls send the rules section and a few similar examples instead of all of instructions.md
+prompts: PromptBuilder | None = None
 
 def load_instructions():
     with open(INSTRUCTIONS_PATH, "r", encoding="utf-8") as f:
         return f.read()
 
-def call_openrouter(prompt:str, instructions:str):
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
+def call_openrouter(prompt:str, instructions:str, model:str | None = None, fresh:bool = False,
+                    call:dict[str, object] | None = None):
+    if prompts is not None:
+        return call_model(prompts.user_message(prompt), prompts.prefix, model, [prompt], check=True, fresh=fresh, call=call)
+    return call_model(f'Convert the following prerequisite text to JSON as per the instructions. Only output the JSON.\n\nText:\n{prompt}', instructions, model, [prompt], check=True, fresh=fresh, call=call)
+
+def call_batch(batch:list[str], instructions:str, model:str | None = None,
+               call:dict[str, object] | None = None, fresh:bool = False) -> tuple[dict[str, dict], list[str]]:
+    # one request for several texts, returns (finished conversions, texts to re-queue)
+    # only cached when every text in it came back, a retry of the same prompt should ask again
+    try:
+        result = call_model(build_batch_prompt(batch), instructions, model, batch, call=call, fresh=fresh,
+                            accept=lambda result: not parse_batch(result, batch)[1])
+    except Exception as e:
+        print(f"Batch of {len(batch)} failed: {e}")
+        return {}, list(batch)
+    return parse_batch(result, batch)
+
+def call_model(content:str, instructions:str, model:str | None = None, texts:list[str] | None = None, check:bool = False,
+               fresh:bool = False, call:dict[str, object] | None = None, accept=None):
+    # `check` validates a single conversion against the schema, as it streams in if streaming.
+    # `fresh` skips reading the cache, and `call` gets filled with the metrics record (which model answered and so on).
+    # `accept(result)` decides whether a parsed response is good enough to cache
     messages = [
         {"role": "system", "content": instructions},
-        {"role": "user", "content": f'Convert the following prerequisite text to JSON as per the instructions. Only output the JSON.\n\nText:\n{prompt}'}
+        {"role": "user", "content": content}
     ]
     data: dict[str, object] = {
-        "model": MODEL,
         "messages": messages,
-        "reasoning" : {
-            "effort": "high",
-            "exclude": False, 
-        }
+        "reasoning" : REASONING,
+        # ask for token counts and cost in the response
+        "usage": {"include": True}
     }
-    response = requests.post(url, headers=headers, json=data)
-    if response.status_code != 200:
-        print(f"Error: Received status code {response.status_code}")
-        print(f"Response content: {response.content}")
-        response.raise_for_status()
-    else: 
-        try:
+    if STREAM:
+        data["stream"] = True
+    model = model or MODEL
+    call = call if call is not None else {}
+    call.update({"time": time.time(), "texts": texts or [content], "requested": model,
+                 "model": model, "cached": False, "retries": 0, "ttfb": None, "ttft": None})
+    start = time.perf_counter()
+    try:
+        if cache is not None and not fresh:
+            raw = cache.get(cache_key(model, instructions, REASONING, content))
+            if raw is not None:
+                call["cached"] = True
+                call["status"] = "parse_error"
+                result = parse_response(raw)
+                # entries cached before validation existed may not pass it, ask again
+                if (not check or is_valid(result)) and (accept is None or accept(result)):
+                    call["status"] = "ok"
+                    return result
+                call["cached"] = False
+        
+        models = [model] + [m for m in FALLBACK_MODELS if m != model]
+        call["status"] = "error"
+        model, response = client.chat(data, models, call)
+        call["model"] = model
+        call["ttfb"] = response.elapsed.total_seconds()
+        if STREAM:
             try:
-                choices = response.json().get("choices", [])
-                if not choices or "message" not in choices[0] or "content" not in choices[0]["message"]:
-                    raise ValueError("Response JSON does not contain expected 'choices/message/content' structure.")
-                content = choices[0]["message"]["content"]
-                # Remove markdown code block if present
-                if content.strip().startswith("```json"):
-                    content = content.strip().split("```json", 1)[1].split("```", 1)[0].strip()
-                elif content.strip().startswith("```"):
-                    content = content.strip().split("```", 1)[1].split("```", 1)[0].strip()
-                return json.loads(content)
-            except (KeyError, IndexError, ValueError, json.JSONDecodeError) as e:
-                print(f"Failed to parse response content: {e}")
-                # print(f"Raw response: {response.text}")
-                raise e
-        except Exception as e:
-            print(f"Failed to JSON response.")
+                raw = read_stream(response, StreamValidator() if check else None, call)
+            except StreamDiverged as e:
+                call["status"] = "diverged"
+                print(f"Aborted {model} stream: {e}")
+                raise
+        else:
+            raw = response.text
+        call["status"] = "parse_error"
+        call.update(usage_fields(json.loads(raw), model))
+        result = parse_response(raw)
+        if check:
+            errors = validate(result)
+            if errors:
+                call["status"] = "invalid"
+                raise ValueError(f"Invalid conversion from {model}: {'; '.join(errors[:3])}")
+        call["status"] = "ok"
+        # only cache responses we could actually parse and that validate
+        if cache is not None and (accept is None or accept(result)):
+            cache.put(cache_key(model, instructions, REASONING, content), raw)
+        return result
+    finally:
+        call["wall"] = time.perf_counter() - start
+        metrics.record(call)
+
+def parse_response(raw:str):
+    try:
+        try:
+            choices = json.loads(raw).get("choices", [])
+            if not choices or "message" not in choices[0] or "content" not in choices[0]["message"]:
+                raise ValueError("Response JSON does not contain expected 'choices/message/content' structure.")
+            content = choices[0]["message"]["content"]
+            # Remove markdown code block if present
+            if content.strip().startswith("```json"):
+                content = content.strip().split("```json", 1)[1].split("```", 1)[0].strip()
+            elif content.strip().startswith("```"):
+                content = content.strip().split("```", 1)[1].split("```", 1)[0].strip()
+            return json.loads(content)
+        except (KeyError, IndexError, ValueError, json.JSONDecodeError) as e:
+            print(f"Failed to parse response content: {e}")
+            # print(f"Raw response: {raw}")
             raise e
+    except Exception as e:
+        print(f"Failed to JSON response.")
+        raise e
 
-def main():
-    global MODEL
+def convert_text(text:str, instructions:str, max_attempts:int = 1,
+                 answered:list[str] | None = None) -> tuple[list[dict[str, object]], list[str]]:
+    # runs in a worker thread, so no input() in here
+    # -> (responses, the model that answered each one)
+    # `answered` are models that already gave an answer for this text, e.g. in a batch
+    responses: list[dict[str, object]] = []
+    sources: list[str] = []
+    answered = answered or []
     
+    # do it twice
+    attempts = 0
+    model = MODEL_1
+    while True:
+        if attempts >= max_attempts:
+            break
+        
+        if attempts > 0 or answered:
+            # a second opinion should come from a model that hasn't answered yet
+            model = next((m for m in (MODEL_2, MODEL_1) if m not in answered + sources), MODEL_2)
+        
+        call: dict[str, object] = {}
+        try:
+            # and never from the cache, which would just hand back the first answer again
+            result = call_openrouter(text, instructions, model, fresh=bool(answered or responses), call=call)
+            responses.append(result) # type: ignore
+            sources.append(call["model"]) # type: ignore
+            attempts += 1
+        except Exception as e:
+            print(f"Error on attempt {attempts} for {text[17:37]}...: {e}")
+            attempts += 0.5 # don't error infinitely
     
-    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
+    return responses, sources
+
+def local_conversions(text:str, fastpath:bool, templates:TemplateIndex | None) -> tuple[list[dict[str, object]], list[str]]:
+    # conversions we can make without the LLM, -> (responses, where each came from)
+    responses: list[tuple[dict[str, object], str]] = []
+    if templates is not None:
+        found = templates.instantiate(text)
+        if found is not None:
+            responses.append((found[1], "template"))
+    if fastpath:
+        local = parse_prerequisite(text)
+        if local is not None:
+            responses.append((local, "fastpath"))
+    # a template copied from an approval that predates validation can be off-schema
+    valid = [(r, source) for r, source in responses if is_valid(r)]
+    return [r for r, _ in valid], [source for _, source in valid]
+
+def agreed(responses:list[dict[str, object]], sources:list[str]) -> dict[str, object] | None:
+    # the first valid response that a response from another source agrees with,
+    # up to child order and how same-logic groups are nested.
+    # One model answering twice (a fallback, a retry) is still one opinion.
+    valid = [(r, source) for r, source in zip(responses, sources) if is_valid(r)]
+    trees = [canonical(from_json(r)) for r, _ in valid]
+    for n, a in enumerate(trees):
+        if any(a is b and valid[n][1] != valid[m][1] for m, b in enumerate(trees[n+1:], n+1)):
+            return valid[n][0]
+    return None
+
+async def convert_all(texts:list[str], instructions:str, concurrency:int = CONCURRENCY, batch_size:int = 1,
+                      fastpath:bool = True, templates:TemplateIndex | None = None, consensus:bool = False):
+    # Keeps up to `concurrency` requests in flight and yields (text, responses, sources)
+    # in the same order as `texts`, sources naming the model (or "template", "fastpath") behind each response, so review can happen while later texts convert.
+    # With batch_size > 1 several texts share a request, anything a batch
+    # drops or mangles is re-queued. Texts that match an approved template
+    # or that the fast path understands skip the LLM, unless `consensus` is set
+    # and they don't yet have two agreeing answers.
+    index = {text: i for i, text in enumerate(texts)}
+    queue: asyncio.Queue[tuple[int, str, list[dict[str, object]], list[str]]] = asyncio.Queue()
+    work: asyncio.Queue[tuple[list[str], int]] = asyncio.Queue()
+    local: dict[str, tuple[list[dict[str, object]], list[str]]] = {}
+    attempts: dict[str, int] = {}
+    llm_texts: list[str] = []
+    for text in texts:
+        local[text] = local_conversions(text, fastpath, templates)
+        if consensus:
+            needed = 0 if agreed(*local[text]) is not None else max(1, 2 - len(local[text][0]))
+        else:
+            needed = 0 if local[text][0] else 1
+        if needed == 0:
+            queue.put_nowait((index[text], text, *local[text]))
+        else:
+            attempts[text] = needed
+            llm_texts.append(text)
+    for batch in make_batches(llm_texts, batch_size):
+        work.put_nowait((batch, 0))
     
-    instructions = load_instructions()
+    async def worker():
+        while True:
+            batch, tries = await work.get()
+            if len(batch) == 1:
+                text = batch[0]
+                try:
+                    responses, sources = await asyncio.to_thread(convert_text, text, instructions, attempts[text])
+                except Exception as e:
+                    print(f"Conversion of {text[17:37]}... crashed: {e}")
+                    responses, sources = [], []
+                await queue.put((index[text], text, local[text][0] + responses, local[text][1] + sources))
+                continue
+            
+            call: dict[str, object] = {}
+            done, missing = await asyncio.to_thread(call_batch, batch, instructions, None, call, tries > 0)
+            # a batch gives each text one answer, texts that need consensus get their second opinion on their own
+            second = [text for text in done if attempts[text] > 1]
+            extra = dict(zip(second, await asyncio.gather(*(
+                asyncio.to_thread(convert_text, text, instructions, attempts[text] - 1, [call["model"]])
+                for text in second))))
+            for text, result in done.items():
+                responses, sources = extra.get(text, ([], []))
+                await queue.put((index[text], text, local[text][0] + [result] + responses,
+                                 local[text][1] + [call["model"]] + sources))
+            if missing:
+                print(f"Re-queueing {len(missing)} of {len(batch)} texts from a batch.")
+                if tries + 1 < BATCH_RETRIES:
+                    work.put_nowait((missing, tries + 1))
+                else:
+                    for text in missing:
+                        work.put_nowait(([text], 0))
+    
+    tasks = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    finished: dict[int, tuple[str, list[dict[str, object]], list[str]]] = {}
+    try:
+        for i in range(len(texts)):
+            while i not in finished:
+                n, text, responses, sources = await queue.get()
+                finished[n] = (text, responses, sources)
+            yield finished.pop(i)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def review(text:str, responses:list[dict[str, object]], results:dict) -> bool:
+    # returns whether a response was saved
+    print("="*50)
+    print(f"{text}")
+    print()
+    
+    for n, result in enumerate(responses):
+        print(f"RESULT ({n+1}/{len(responses)}) RECIEVED:")
+        print_human_readable(result) # type: ignore
+        for error in validate(result):
+            print(f"SCHEMA ERROR: {error}")
+        print()
+    
+    nearest = neardups.nearest_approved(text, results) if neardups is not None else None
+    if nearest is not None:
+        similarity, other = nearest
+        neighbour = results[other][0] if isinstance(results[other], list) else results[other]
+        print(f"NEAREST APPROVED TEXT ({similarity:.0%} similar), changes from it:")
+        print(token_diff(other, text))
+        print_human_readable(neighbour)
+        if any(equivalent(neighbour, r) for r in responses):
+            print("A response matches the nearest approved conversion.")
+        print()
+    
+    while True:
+        if len(responses) == 0:
+            input("No responses generated. Press enter to continue: ")
+            return False
+        
+        print("-"*40)
+        print("Conversion finished.")
+        if len(responses) >= 2 and equivalent(responses[0], responses[1]):
+            print("Both responses match!")
+        elif len(responses) == 1:
+            pass
+        elif len(responses) == 0:
+            print("Failed to generate conversion.")
+        else:
+            print("RESPONSES DO NOT MATCH.")
+        print("(p): print raw responses (s): skip" + (" (n): save the nearest approved conversion" if nearest else ""))
+        i = input(f"({'/'.join(str(n+1) for n in range(len(responses)))}): save response: ")
+        if i == 'p':
+            print("-"*40)
+            for n, r in enumerate(responses):
+                print(f"{n} :")
+                print(json.dumps(r, indent=2, ensure_ascii=False))
+                print()
+            print("-"*40)
+            
+        elif i.isdigit() and 1 <= int(i) <= len(responses):
+            results[text] = responses[int(i) - 1]
+            journal.append(text, results[text])
+            return True
+        elif i == 'n' and nearest is not None:
+            results[text] = neighbour
+            journal.append(text, results[text])
+            return True
+        elif i == 's':
+            print("Skipping.")
+            return False
+
+def auto_review(text:str, responses:list[dict[str, object]], sources:list[str], results:dict) -> bool:
+    # headless: accept answers that validate and agree between different models, queue the rest for a person
+    result = agreed(responses, sources)
+    if result is not None:
+        results[text] = result
+        journal.append(text, result)
+        print(f"Auto-accepted {text[17:57]}...")
+        return True
+    review_queue.append(text, responses)
+    print(f"Queued for review: {text[17:57]}...")
+    return False
+
+def drain_review_queue():
+    # fast review session over everything headless runs queued, no LLM calls
+    global neardups
+    results = journal.recover()
+    neardups = NearDupIndex(prerequisites)
+    entries = review_queue.load()
+    print(f"{len(entries)} conversions waiting for review.")
+    try:
+        for text, responses in list(entries.items()):
+            if text in results:
+                del entries[text]
+                continue
+            if review(text, responses, results):
+                del entries[text]
+    finally:
+        review_queue.rewrite(entries)
+        journal.compact(results)
+    print(f"{len(entries)} conversions left in {review_queue.path}.")
+
+async def run(concurrency:int, batch_size:int, fastpath:bool, use_cache:bool, auto:bool, stream:bool,
+              few_shot:int = 0):
+    global client, cache, STREAM, neardups, prompts
+    started = time.perf_counter()
+    STREAM = stream
+    if not use_cache:
+        cache = None
+    if concurrency > CONCURRENCY:
+        client = OpenRouterClient(OPENROUTER_API_KEY, pool_size=concurrency)
     
+    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
     
-    # Load existing results if the file exists
-    if os.path.exists(OUTPUT_PATH):
-        with open(OUTPUT_PATH, "r", encoding="utf-8") as f:
-            results = json.load(f)
-    else:
-        results = {}
+    instructions = load_instructions()
+    if not auto:
+        neardups = NearDupIndex(prerequisites)
+    # Load existing results, replaying approvals from a session that didn't finish
+    results = journal.recover()
+    queued = review_queue.load() if auto else {}
+    if few_shot:
+        prompts = PromptBuilder(instructions, results, few_shot)
     
     count_existing = sum(1 for text in prerequisites if text in results)
     count_hard = sum(1 for text in prerequisites if text in hard_cases)
@@ -90,7 +418,10 @@ def main():
     print(f"{count_existing} out of {len(prerequisites)} prerequisites already exist in results.")
     print(f"{count_hard} out of {len(prerequisites)} prerequisites cannot be converted.")
     print(f"{remaining} prerequisites remain to be converted.")
-
+    if queued:
+        print(f"{len(queued)} of those are waiting in the review queue (convert.py --review).")
+    
+    pending: list[str] = []
     for text in prerequisites:
         
         # temporarily skip bad ones
@@ -105,83 +436,62 @@ def main():
             # print(f"Skipping {text[17:37]}... because it already exists.")
             continue
         
+        if text in queued:
+            continue
+        
         # if len(text) > 150:
         #     print(f"Skipping {text[17:37]}... because it is too complicated.")
         #     continue
         
-        print("="*50)
-        print(f"{text}")
-        print()
-        responses: list[dict[str, object]] = []
-        
-        # do it twice
-        attempts = 0
-        max_attempts = 1
-        MODEL = MODEL_1
-        while True:
-            if attempts >= max_attempts:
-                break
-            
-            if attempts > 0:
-                MODEL = MODEL_2
-            
-            try:
-                result = call_openrouter(text, instructions)
-                responses.append(result) # type: ignore
-                print(f"RESULT ({attempts+1}/{max_attempts}) RECIEVED:")
-                
-                # print(result)
-                
-                print_human_readable(result)
-                print()
-                attempts += 1
-            except Exception as e:
-                print(f"Error on attempt {attempts}.")
-                attempts += 0.5 # don't error infinitely
-                input("Press enter to try again: ")
-                print()
-        
-        while True:
-            if len(responses) == 0:
-                input("No responses generated. Press enter to continue: ")
-                break
-            
-            print("-"*40)
-            print("Conversion finished.")
-            if len(responses) >= 2 and responses[0] == responses[1]:
-                print("Both responses match!")
-            elif len(responses) == 1:
-                pass
-            elif len(responses) == 0:
-                print("Failed to generate conversion.")
+        pending.append(text)
+    
+    # to_thread runs on the default executor, make sure it is big enough
+    # for every in-flight request plus the review prompt
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency + 1))
+    
+    try:
+        async for text, responses, sources in convert_all(pending, instructions, concurrency, batch_size, fastpath,
+                                                 TemplateIndex(results), consensus=auto):
+            if auto:
+                auto_review(text, responses, sources, results)
             else:
-                print("RESPONSES DO NOT MATCH.")
-            print("(p): print raw responses (s): skip")
-            i = input("(1/2): save response: ")
-            if i == 'p':
-                print("-"*40)
-                for n, r in enumerate(responses):
-                    print(f"{n} :")
-                    print(json.dumps(r, indent=2, ensure_ascii=False))
-                    print()
-                print("-"*40)
-                
-            elif i == '1' or i == '2':
-                if i == '1':
-                    results[text] = responses[0]
-                elif i == '2':
-                    results[text] = responses[1]
-                with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-                    json.dump(results, f, indent=2, ensure_ascii=False)
-                break
-            elif i == 's':
-                print("Skipping.")
-                break
-            
-            
-            
+                # input() blocks, so review in a thread to keep the event loop dispatching
+                await asyncio.to_thread(review, text, responses, results)
+    finally:
+        journal.compact(results)
+    
+    print(metrics.summary(time.perf_counter() - started))
+    if cache is not None:
+        print(cache.stats())
     print("Done. Results saved to", OUTPUT_PATH)
 
+def main():
+    parser = argparse.ArgumentParser(description="Convert prerequisite text to JSON.")
+    parser.add_argument("-j", "--concurrency", type=int, default=CONCURRENCY,
+                        help=f"number of requests to keep in flight (default {CONCURRENCY})")
+    parser.add_argument("-b", "--batch", type=int, default=1,
+                        help="convert up to this many texts per request (default 1, no batching)")
+    parser.add_argument("--no-fastpath", action="store_true",
+                        help="send every text to the LLM, even ones the rule-based parser understands")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="don't read or write the on-disk response cache")
+    parser.add_argument("--auto", action="store_true",
+                        help="don't prompt: accept answers that validate and agree, queue the rest for review")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream responses and abort ones that stop looking like valid JSON")
+    parser.add_argument("--few-shot", type=int, default=0, metavar="K",
+                        help="send the rules and the K most similar approved examples instead of all of "
+                             "instructions.md (single-text requests only)")
+    parser.add_argument("--review", action="store_true",
+                        help="review the conversions queued by --auto runs")
+    args = parser.parse_args()
+    if args.review:
+        drain_review_queue()
+        return
+    asyncio.run(run(max(1, args.concurrency), max(1, args.batch), not args.no_fastpath, not args.no_cache, args.auto,
+                    args.stream, max(0, args.few_shot)))
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,262 @@
+import re
+import json
+import time
+import random
+from dataclasses import dataclass, field
+
+from nodes import (from_json, PrerequisiteGroup, ContentScoreRequirement, OtherRequirement, ContentCollegeCourse,
+                   ContentOtherCourse, ContentExam, ContentCollegeCredits, ContentCollegeCompletedCourses,
+                   ScoreLetter, ScorePercentage, ScoreExam, ScoreLiteral, ScoreCompletion)
+from canonical import canonical
+
+
+# Which courses can a student register for? Evaluates every course's prerequisite
+# tree against a transcript. Results are three-valued so they combine with min/max:
+# AND is the lowest child, OR the highest.
+NO = 0
+MANUAL = 1  # needs a person, e.g. permission of the department
+YES = 2
+STATUS_NAMES = {NO: "no", MANUAL: "needs manual approval", YES: "yes"}
+
+# lowest to highest, anything not listed (W, I, ...) doesn't count as passed
+GRADES = ["F", "D", "C-", "C", "C+", "B-", "B", "B+", "A-", "A", "A+"]
+GRADE_RANK = {grade: rank for rank, grade in enumerate(GRADES)}
+PASSING_RANK = GRADE_RANK["D"]
+# satisfactory/unsatisfactory courses
+PASS_LITERALS = {"S", "P", "PASS", "SATISFACTORY"}
+# lowest percentage for each letter, for high school courses reported one way and required the other
+LETTER_PERCENT = {"A": 86, "B": 73, "C+": 67, "C": 60, "C-": 50, "F": 0}
+PERCENT_LETTER = sorted(((p, g) for g, p in LETTER_PERCENT.items()), reverse=True)
+# "3", "Level 3", "30 or higher", "6.5"
+NUMERIC_LITERAL = re.compile(r"^(level\s*)?(\d+(\.\d+)?)(\s*or higher)?$", re.IGNORECASE)
+DEFAULT_CREDITS = 3
+
+
+def passed(grade:str | None) -> bool:
+    if grade is None:
+        return False
+    return GRADE_RANK.get(grade, -1) >= PASSING_RANK or grade.upper() in PASS_LITERALS
+
+
+def numeric(value:object) -> float | None:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = NUMERIC_LITERAL.match(str(value).strip())
+    return float(match.group(2)) if match else None
+
+
+def normalize(name:str) -> str:
+    return " ".join(name.casefold().split())
+
+
+@dataclass
+class Transcript:
+    # "CPSC 1150" -> final grade ("B+", "S", ...)
+    courses: dict[str, str] = field(default_factory=dict)
+    # courses the student is registered in this term, they count where concurrent registration is allowed
+    in_progress: set[str] = field(default_factory=set)
+    # "CPSC 1150" -> credits, when it isn't DEFAULT_CREDITS
+    credits: dict[str, float] = field(default_factory=dict)
+    # courses that don't transfer to a university
+    non_transferable: set[str] = field(default_factory=set)
+    # "LET" -> 3, "IELTS" -> 6.5, "MDT" -> 65
+    exams: dict[str, float | str] = field(default_factory=dict)
+    # "Pre-calculus 12" -> 78 or "B"
+    high_school: dict[str, int | str] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.refresh()
+
+    def refresh(self):
+        # call again after editing the fields above
+        # lookups by normalized name, and one row per passed course for the aggregates
+        self.exam_scores = {normalize(k): v for k, v in self.exams.items()}
+        self.high_school_grades = {normalize(k): v for k, v in self.high_school.items()}
+        self.passed_courses: list[tuple[str, int, float, bool, str]] = []
+        for course, grade in self.courses.items():
+            if not passed(grade):
+                continue
+            subject, _, code = course.partition(" ")
+            level = int(code[0]) if code[:1].isdigit() else 0
+            self.passed_courses.append((subject, level, self.credits.get(course, DEFAULT_CREDITS),
+                                        course not in self.non_transferable, grade))
+
+    @classmethod
+    def from_json(cls, data:dict) -> "Transcript":
+        return cls(courses=data.get("courses", {}), in_progress=set(data.get("in_progress", [])),
+                   credits=data.get("credits", {}), non_transferable=set(data.get("non_transferable", [])),
+                   exams=data.get("exams", {}), high_school=data.get("high_school", {}))
+
+
+def meets_grade(grade:str, score) -> int:
+    # a college grade against a score requirement
+    if isinstance(score, ScoreCompletion):
+        return YES if passed(grade) else NO
+    if isinstance(score, ScoreLetter):
+        if score.min_grade not in GRADE_RANK:
+            return YES if normalize(grade) == normalize(score.min_grade) else NO
+        return YES if GRADE_RANK.get(grade, -1) >= GRADE_RANK[score.min_grade] else NO
+    if isinstance(score, ScoreLiteral):
+        if score.score.upper() in PASS_LITERALS:
+            return YES if grade.upper() in PASS_LITERALS else NO
+        return YES if normalize(grade) == normalize(score.score) else NO
+    return MANUAL
+
+
+def meets_value(value:object, score) -> int:
+    # an exam score or high school grade against a score requirement
+    if isinstance(score, ScoreCompletion):
+        return YES
+    if isinstance(score, ScoreLetter):
+        if isinstance(value, str):
+            return meets_grade(value, score)
+        if score.min_grade in LETTER_PERCENT:
+            return YES if float(value) >= LETTER_PERCENT[score.min_grade] else NO  # type: ignore
+        return MANUAL
+    if isinstance(score, ScorePercentage):
+        if isinstance(value, str):
+            value = LETTER_PERCENT.get(value, None)  # type: ignore
+            if value is None:
+                return MANUAL
+        return YES if float(value) >= score.min_percent else NO  # type: ignore
+    if isinstance(score, (ScoreExam, ScoreLiteral)):
+        required = numeric(score.min_score if isinstance(score, ScoreExam) else score.score)
+        have = numeric(value)
+        if required is not None and have is not None:
+            return YES if have >= required else NO
+        if isinstance(score, ScoreLiteral) and normalize(str(value)) == normalize(score.score):
+            return YES
+        # sub-scores like "5 in English usage" aren't in the transcript
+        return MANUAL
+    return MANUAL
+
+
+def meets_aggregate(content, score, transcript:Transcript) -> int:
+    # credits or a number of courses, counting passed courses that match the filters and the score
+    subjects = None if content.subjects is None else {s.upper() for s in content.subjects}
+    total = 0.0
+    for subject, level, credits, transferable, grade in transcript.passed_courses:
+        if subjects is not None and subject not in subjects:
+            continue
+        if content.year is not None and level != content.year:
+            continue
+        if content.university_transferable and not transferable:
+            continue
+        result = meets_grade(grade, score)
+        if result == MANUAL:
+            return MANUAL
+        if result == YES:
+            total += credits if isinstance(content, ContentCollegeCredits) else 1
+    needed = content.credits if isinstance(content, ContentCollegeCredits) else content.count
+    return YES if total >= needed else NO
+
+
+def evaluate(node, transcript:Transcript, memo:dict[int, int]) -> int:
+    # Trees are canonical, so shared subtrees are the same object and only get
+    # evaluated once per transcript through `memo`.
+    found = memo.get(id(node))
+    if found is not None:
+        return found
+
+    if isinstance(node, PrerequisiteGroup):
+        if node.logic == "AND":
+            result = YES
+            for child in node.children:
+                result = min(result, evaluate(child, transcript, memo))
+                if result == NO:
+                    break
+        else:
+            result = NO
+            for child in node.children:
+                result = max(result, evaluate(child, transcript, memo))
+                if result == YES:
+                    break
+    elif isinstance(node, ContentScoreRequirement):
+        content, score = node.content, node.score
+        if isinstance(content, ContentCollegeCourse):
+            course = f"{content.subject} {content.course_code}"
+            grade = transcript.courses.get(course)
+            if content.can_be_taken_concurrently and course in transcript.in_progress:
+                # registered this term, which also covers retaking a course whose grade wasn't enough
+                result = YES
+            elif grade is not None:
+                result = meets_grade(grade, score)
+            else:
+                result = NO
+        elif isinstance(content, ContentExam):
+            value = transcript.exam_scores.get(normalize(content.exam))
+            result = NO if value is None else meets_value(value, score)
+        elif isinstance(content, ContentOtherCourse):
+            value = transcript.high_school_grades.get(normalize(content.course))
+            result = NO if value is None else meets_value(value, score)
+        elif isinstance(content, (ContentCollegeCredits, ContentCollegeCompletedCourses)):
+            result = meets_aggregate(content, score, transcript)
+        else:
+            # EquivalentCourse and anything off-schema
+            result = MANUAL
+    else:
+        # OtherRequirement and anything off-schema
+        result = MANUAL
+
+    memo[id(node)] = result
+    return result
+
+
+def load_catalog(converted_path:str = "data/converted.json") -> list[tuple[str, object]]:
+    # (course, canonical tree) for every course, tree None means no prerequisites.
+    # Courses whose text hasn't been converted get an OtherRequirement so they come out as manual.
+    from data.data import prerequisites
+
+    with open(converted_path, "r", encoding="utf-8") as f:
+        converted = json.load(f)
+    trees = {}
+    for text, result in converted.items():
+        trees[text] = canonical(from_json(result[0] if isinstance(result, list) else result))
+    catalog = []
+    for subject, course_code, text in prerequisites:
+        tree = trees[text] if text in trees else canonical(OtherRequirement(text))
+        catalog.append((f"{subject} {course_code}", tree))
+    return catalog
+
+
+def eligibility(transcript:Transcript, catalog:list[tuple[str, object]]) -> dict[str, int]:
+    memo: dict[int, int] = {}
+    return {course: YES if tree is None else evaluate(tree, transcript, memo) for course, tree in catalog}
+
+
+def random_transcript(catalog:list[tuple[str, object]], rng:random.Random, courses:int = 20) -> Transcript:
+    # plausible fake students for benchmarks
+    taken = rng.sample([course for course, _ in catalog], min(courses, len(catalog)))
+    return Transcript(
+        courses={course: rng.choice(GRADES + ["S"]) for course in taken},
+        in_progress=set(rng.sample([course for course, _ in catalog], 3)),
+        exams={"LET": rng.randint(1, 5), "MDT": rng.randint(20, 100), "IELTS": rng.choice([5.5, 6, 6.5, 7])},
+        high_school={"English Studies 12": rng.randint(50, 100), "Pre-calculus 12": rng.randint(50, 100),
+                     "Foundations of Mathematics 12": rng.randint(50, 100)},
+    )
+
+
+if __name__ == "__main__":
+    import sys
+
+    catalog = load_catalog()
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "r", encoding="utf-8") as f:
+            transcript = Transcript.from_json(json.load(f))
+        results = eligibility(transcript, catalog)
+        for status in (YES, MANUAL):
+            courses = sorted(course for course, result in results.items() if result == status)
+            print(f"{STATUS_NAMES[status].upper()} ({len(courses)}):")
+            print("  " + ", ".join(courses))
+        print(f"{sum(1 for r in results.values() if r == NO)} courses not available.")
+    else:
+        rng = random.Random(0)
+        transcripts = [random_transcript(catalog, rng) for _ in range(200)]
+        start = time.perf_counter()
+        for transcript in transcripts:
+            eligibility(transcript, catalog)
+        elapsed = time.perf_counter() - start
+        per_student = elapsed / len(transcripts)
+        print(f"Evaluated {len(catalog)} courses for {len(transcripts)} random students: "
+              f"{per_student * 1000:.2f}ms per student, {per_student / len(catalog) * 1e6:.2f}us per course.")
+        print("Pass a transcript JSON file to see what one student can register for.")
@@ -0,0 +1,212 @@
+import re
+import sys
+import json
+
+
+# Rule-based parser for the common prerequisite shapes, so they don't need an LLM call.
+# Anything it isn't sure about returns None and goes to the LLM as before.
+
+PREFIX = "Prerequisite(s): "
+
+# trailing sentences that never go into the data (see "What Not to Include")
+IGNORED_SENTENCES = [
+    re.compile(r"^Prerequisites are (only )?valid for (only )?three years$"),
+    re.compile(r"^(Math prerequisites|Prerequisites) are valid for only three years$"),
+    re.compile(r"^\(?[A-Z]{3,4} \d{4}( and \d{4})? (is |are )?(strongly )?recommended\.?\)?$"),
+]
+
+OTHER_REQUIREMENT = re.compile(
+    r"^(permission of (the )?(instructor|department|program coordinator|the department)"
+    r"|instructor permission|consent of the instructor|demonstrated equivalent competency)$"
+)
+
+GRADE_PHRASE = re.compile(r'^(?:(?P<min>a minimum )|an? )"(?P<grade>[A-Z][+-]?|SR)" grade (?:in|for) ', re.IGNORECASE)
+LETTER_GRADES = {"A+", "A", "A-", "B+", "B", "B-", "C+", "C", "C-", "D", "P"}
+LITERAL_GRADES = {"S", "SR"}
+
+COURSE = re.compile(r"^(?:(?P<subject>[A-Z]{4}) )?(?P<code>\d{4})$")
+CONCURRENT = " (may be taken concurrently)"
+
+
+class Unparseable(Exception):
+    pass
+
+
+def course(subject:str, code:str, score:dict, concurrent:bool) -> dict:
+    return {
+        "type": "ContentScoreRequirement",
+        "content": {
+            "type": "ContentCollegeCourse",
+            "subject": subject,
+            "courseCode": code,
+            "canBeTakenConcurrently": concurrent
+        },
+        "score": dict(score)
+    }
+
+
+def other(note:str) -> dict:
+    return {"type": "OtherRequirement", "note": note}
+
+
+def group(logic:str, children:list[dict], flatten:bool = False) -> dict:
+    if len(children) == 1:
+        return children[0]
+    if flatten:
+        flat = []
+        for child in children:
+            if child["type"] == "PrerequisiteGroup" and child["logic"] == logic:
+                flat.extend(child["children"])
+            else:
+                flat.append(child)
+        children = flat
+    return {"type": "PrerequisiteGroup", "logic": logic, "children": children}
+
+
+def split_list(text:str) -> tuple[list[str], str | None]:
+    # "A, B, and C" / "A or B" -> (items, conjunction)
+    for conjunction in ("and", "or"):
+        for separator in (f", {conjunction} ", f" {conjunction} "):
+            if separator in text:
+                head, _, last = text.rpartition(separator)
+                items = head.split(", ") + [last]
+                if any(" and " in item or " or " in item for item in items):
+                    raise Unparseable(text)
+                return items, conjunction
+    if ", " in text:
+        raise Unparseable(text)
+    return [text], None
+
+
+def parse_course_list(text:str, score:dict) -> dict:
+    concurrent = text.endswith(CONCURRENT)
+    if concurrent:
+        text = text[:-len(CONCURRENT)]
+
+    logic = None
+    for lead, lead_logic in (("all of the following: ", "AND"), ("one of the following: ", "OR"),
+                             ("one of ", "OR"), ("both ", "AND")):
+        if text.startswith(lead):
+            text = text[len(lead):]
+            logic = lead_logic
+            break
+
+    items, conjunction = split_list(text)
+    if conjunction is not None:
+        list_logic = "AND" if conjunction == "and" else "OR"
+        if logic is not None and logic != list_logic:
+            raise Unparseable(text)
+        logic = list_logic
+    elif logic is not None and logic != "AND" and len(items) > 1:
+        raise Unparseable(text)
+
+    children = []
+    subject = None
+    for n, item in enumerate(items):
+        if logic == "OR" and n == len(items) - 1 and item in ("equivalent", "demonstrated equivalent competency"):
+            children.append(other(item))
+            continue
+        match = COURSE.match(item)
+        if match is None:
+            raise Unparseable(item)
+        subject = match["subject"] or subject
+        if subject is None:
+            raise Unparseable(item)
+        children.append(course(subject, match["code"], score, concurrent))
+    return group(logic or "AND", children)
+
+
+def parse_requirement(text:str, previous_score:dict | None) -> tuple[dict, dict | None]:
+    if text.startswith("and "):
+        text = text[4:]
+    if OTHER_REQUIREMENT.match(text):
+        return other(text), previous_score
+
+    match = GRADE_PHRASE.match(text)
+    if match is not None:
+        grade = match["grade"]
+        if match["min"] and grade in LETTER_GRADES:
+            score = {"type": "ScoreLetter", "minGrade": grade}
+        elif not match["min"] and grade in LITERAL_GRADES:
+            score = {"type": "ScoreLiteral", "score": grade}
+        else:
+            raise Unparseable(text)
+        text = text[match.end():]
+    elif previous_score is not None:
+        # no grade given, reuse one already seen in the text (see Example 9)
+        score = previous_score
+    else:
+        score = {"type": "ScoreCompletion"}
+    return parse_course_list(text, score), score
+
+
+def parse_body(body:str) -> dict:
+    alternatives = []
+    score = None
+    for alternative in body.split("; or "):
+        parts = []
+        for part in alternative.split("; "):
+            requirement, score = parse_requirement(part, score)
+            parts.append(requirement)
+        alternatives.append(group("AND", parts))
+    # "A or B; or C" is one OR group in the approved data, not two
+    return group("OR", alternatives, flatten=True)
+
+
+def parse_prerequisite(text:str) -> dict | None:
+    # Returns the converted object, or None if the text isn't one of the shapes we know.
+    if not text.startswith(PREFIX):
+        return None
+    sentences = re.split(r"(?<=[.)])\s+(?=[A-Z(])", text[len(PREFIX):].strip())
+    body = sentences[0].rstrip(".")
+    for sentence in sentences[1:]:
+        if not any(pattern.match(sentence.rstrip(".")) for pattern in IGNORED_SENTENCES):
+            return None
+
+    if body in ("None", "None."):
+        return {"prerequisites": None}
+    # the first word is capitalized in the source
+    body = body[0].lower() + body[1:]
+    try:
+        return {"prerequisites": parse_body(body)}
+    except Unparseable:
+        return None
+
+
+def report(verbose:bool = False):
+    # How often the fast path fires, and how often it agrees with the approved conversions.
+    from data.text import prerequisites
+    from canonical import equivalent
+
+    with open("data/converted.json", "r", encoding="utf-8") as f:
+        converted = json.load(f)
+
+    parsed = matched = equivalent_count = compared = 0
+    for text in prerequisites:
+        result = parse_prerequisite(text)
+        if result is None:
+            continue
+        parsed += 1
+        if text not in converted:
+            continue
+        approved = converted[text]
+        if isinstance(approved, list):
+            approved = approved[0]
+        compared += 1
+        if result["prerequisites"] == approved.get("prerequisites"):
+            matched += 1
+        elif equivalent(result, approved):
+            equivalent_count += 1
+        elif verbose:
+            print("MISMATCH:", text)
+            print("  fast path:", json.dumps(result["prerequisites"], ensure_ascii=False))
+            print("  approved: ", json.dumps(approved.get("prerequisites"), ensure_ascii=False))
+
+    print(f"Fast path parsed {parsed} out of {len(prerequisites)} texts ({parsed / len(prerequisites) * 100:.1f}%).")
+    if compared:
+        print(f"{matched} out of {compared} match the approved conversion ({matched / compared * 100:.1f}%), "
+              f"{equivalent_count} more are equivalent up to ordering and grouping.")
+
+
+if __name__ == "__main__":
+    report("-v" in sys.argv)
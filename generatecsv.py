@@ -1,6 +1,9 @@
 import json
 import csv
 from data.data import prerequisites
+from nodes import from_json, PrerequisiteGroup, ContentScoreRequirement, ContentCollegeCourse, ContentExam, ContentOtherCourse
+from eligibility import load_catalog
+from graph import CourseGraph, UNREACHABLE
 
 # Load converted.json
 with open('data/converted.json', 'r', encoding='utf-8') as f:
@@ -14,46 +17,31 @@ for subject, course_code, prereq_text in prerequisites:
 points = {}
 links = []
 
-def extract_points_and_links(prereq_obj, source_id, source_group, link_strength):
-    if not prereq_obj:
+def extract_points_and_links(node, source_id, source_group, link_strength):
+    if node is None:
         return
 
-    if isinstance(prereq_obj, dict):
-        node_type = prereq_obj.get('type')
-        if node_type == 'ContentScoreRequirement':
-            content = prereq_obj.get('content', {})
-            content_type = content.get('type')
-            if content_type == 'ContentCollegeCourse':
-                cid = content['subject'] + " " + content['courseCode']
-                points[cid] = content['subject']
-                links.append((source_id, cid, link_strength))
-            elif content_type == 'ContentExam':
-                cid = content['exam']
-                points[cid] = "Exam"
-                links.append((source_id, cid, link_strength))
-            elif content_type == 'ContentOtherCourse':
-                cid = content['course']
-                points[cid] = "HS Course"
-                links.append((source_id, cid, link_strength))
-        elif node_type == 'CollegeCourse':
-            cid = prereq_obj['subject'] + " " + prereq_obj['course_code']
-            points[cid] = prereq_obj['subject']
+    if isinstance(node, ContentScoreRequirement):
+        content = node.content
+        if isinstance(content, ContentCollegeCourse):
+            cid = content.subject + " " + content.course_code
+            points[cid] = content.subject
             links.append((source_id, cid, link_strength))
-        elif node_type == 'ContentExam':
-            cid = prereq_obj['exam']
+        elif isinstance(content, ContentExam):
+            cid = content.exam
             points[cid] = "Exam"
             links.append((source_id, cid, link_strength))
-        elif node_type == 'ContentOtherCourse':
-            cid = prereq_obj['course']
+        elif isinstance(content, ContentOtherCourse):
+            cid = content.course
             points[cid] = "HS Course"
             links.append((source_id, cid, link_strength))
-        elif node_type == 'PrerequisiteGroup':
-            for child in prereq_obj.get('children', []):
-                if prereq_obj.get('logic') == "AND":
-                    extract_points_and_links(child, source_id, source_group, link_strength)
-                else:
-                    extract_points_and_links(child, source_id, source_group, link_strength / 2)
-        # Ignore OtherRequirement, etc.
+    elif isinstance(node, PrerequisiteGroup):
+        for child in node.children:
+            if node.logic == "AND":
+                extract_points_and_links(child, source_id, source_group, link_strength)
+            else:
+                extract_points_and_links(child, source_id, source_group, link_strength / 2)
+    # Ignore OtherRequirement, etc.
 
 # Process each prereq_text and all associated courses
 for prereq_text, prereq_data_list in converted.items():
@@ -67,7 +55,7 @@ for prereq_text, prereq_data_list in converted.items():
     else:
         true_prereq = prereq_data_list
 
-    prereq_obj = true_prereq['prerequisites']
+    prereq_obj = from_json(true_prereq)
 
     for subject, course_code in course_infos:
         source_id = subject + " " + course_code
@@ -89,10 +77,13 @@ for target, source, _ in links:
     if size_counter[source] < 5:
         size_counter[source] += 1
 
+# depth: topological level (longest run of prerequisites), chain: fewest terms to reach the course
+graph = CourseGraph(load_catalog())
+
 # Write points.csv
 with open('data/points.csv', 'w', newline='', encoding='utf-8') as f:
     writer = csv.writer(f)
-    writer.writerow(['ID', 'Group', 'url', 'size'])
+    writer.writerow(['ID', 'Group', 'url', 'size', 'depth', 'chain'])
     for cid, group in points.items():
         # Try to split cid into subject and course_code
         if group not in ("Exam", "HS Course"):
@@ -104,7 +95,11 @@ with open('data/points.csv', 'w', newline='', encoding='utf-8') as f:
         else:
             url = ""
         size = size_counter.get(cid, 0)
-        writer.writerow([cid, group, url, size])
+        depth = chain = ""
+        if cid in graph.edges:
+            depth = graph.level(cid)
+            chain = "" if graph.chains[cid] == UNREACHABLE else int(graph.chains[cid])
+        writer.writerow([cid, group, url, size, depth, chain])
 
 
 # Write links.csv
@@ -0,0 +1,181 @@
+import time
+
+from nodes import PrerequisiteGroup, ContentScoreRequirement, ContentCollegeCourse
+from eligibility import load_catalog
+
+
+# The course dependency graph: an edge from each course to every college course
+# in its prerequisite tree. Strongly connected components (cycles) are found with
+# an iterative Tarjan, which also yields them dependencies first, so closures and
+# levels are each computed once per component from the ones it depends on.
+
+UNREACHABLE = float("inf")
+
+
+def course_leaves(node, found:dict[str, bool]) -> dict[str, bool]:
+    # course -> can be taken concurrently, for every college course in a tree
+    if isinstance(node, PrerequisiteGroup):
+        for child in node.children:
+            course_leaves(child, found)
+    elif isinstance(node, ContentScoreRequirement) and isinstance(node.content, ContentCollegeCourse):
+        course = f"{node.content.subject} {node.content.course_code}"
+        found[course] = found.get(course, True) and node.content.can_be_taken_concurrently
+    return found
+
+
+class CourseGraph:
+
+    def __init__(self, catalog:list[tuple[str, object]]):
+        self.trees = dict(catalog)
+        self.edges: dict[str, list[str]] = {}
+        for course, tree in catalog:
+            self.edges[course] = sorted(course_leaves(tree, {})) if tree is not None else []
+        for targets in list(self.edges.values()):
+            for target in targets:
+                self.edges.setdefault(target, [])  # referenced but not offered
+        self.components = self.tarjan()
+        self.component_of = {course: i for i, component in enumerate(self.components) for course in component}
+        self.closures: list[frozenset[str]] = []
+        self.levels: list[int] = []
+        for i, component in enumerate(self.components):
+            reached: set[str] = set()
+            level = 0
+            for course in component:
+                for target in self.edges[course]:
+                    j = self.component_of[target]
+                    if j != i:
+                        reached |= self.closures[j]
+                        level = max(level, self.levels[j] + 1)
+                    reached.add(target)
+            self.closures.append(frozenset(reached))
+            self.levels.append(level)
+        self.chains = self.chain_lengths()
+
+    def tarjan(self) -> list[list[str]]:
+        # iterative so long chains can't hit the recursion limit
+        index: dict[str, int] = {}
+        low: dict[str, int] = {}
+        on_stack: set[str] = set()
+        stack: list[str] = []
+        components: list[list[str]] = []
+        for root in self.edges:
+            if root in index:
+                continue
+            work = [(root, 0)]
+            while work:
+                course, i = work.pop()
+                if i == 0:
+                    index[course] = low[course] = len(index)
+                    stack.append(course)
+                    on_stack.add(course)
+                targets = self.edges[course]
+                if i < len(targets):
+                    work.append((course, i + 1))
+                    target = targets[i]
+                    if target not in index:
+                        work.append((target, 0))
+                    elif target in on_stack:
+                        low[course] = min(low[course], index[target])
+                    continue
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[course])
+                if low[course] == index[course]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == course:
+                            break
+                    components.append(sorted(component))
+        return components
+
+    def chain_lengths(self) -> dict[str, float]:
+        # The fewest terms to reach each course, taking the AND/OR logic into account:
+        # an AND waits for its longest child, an OR for its shortest, a concurrent course
+        # can share the term. Relaxed until nothing changes, so cycles come out as
+        # UNREACHABLE instead of looping. Courses with no tree in the catalog count as 1.
+        chains: dict[str, float] = {course: UNREACHABLE if course in self.trees else 1 for course in self.edges}
+
+        def need(node) -> float:
+            if isinstance(node, PrerequisiteGroup):
+                values = [need(child) for child in node.children]
+                return max(values) if node.logic == "AND" else min(values)
+            if isinstance(node, ContentScoreRequirement) and isinstance(node.content, ContentCollegeCourse):
+                chain = chains[f"{node.content.subject} {node.content.course_code}"]
+                return chain - 1 if node.content.can_be_taken_concurrently else chain
+            return 0
+
+        # dependencies first, a component only needs more than one pass if it's a cycle
+        for component in self.components:
+            changed = True
+            while changed:
+                changed = False
+                for course in component:
+                    if course not in self.trees:
+                        continue
+                    tree = self.trees[course]
+                    chain = 1 + (0 if tree is None else need(tree))
+                    if chain < chains[course]:
+                        chains[course] = chain
+                        changed = True
+        return chains
+
+    def closure(self, course:str) -> frozenset[str]:
+        # every course reachable through prerequisites, ignoring whether it's AND or OR
+        return self.closures[self.component_of[course]]
+
+    def level(self, course:str) -> int:
+        # topological level, the longest run of prerequisites below the course
+        return self.levels[self.component_of[course]]
+
+    def cycles(self) -> list[list[str]]:
+        return [c for c in self.components if len(c) > 1 or c[0] in self.edges[c[0]]]
+
+    def longest_path(self) -> list[str]:
+        # one longest prerequisite chain, deepest course first. Levels belong to components,
+        # so in a cycle the edge down a level may leave from another member: go through it first
+        def below(course:str) -> list[str]:
+            return [t for t in self.edges[course] if self.level(t) == self.level(course) - 1]
+
+        course = max(self.edges, key=lambda c: (self.level(c), c))
+        path = [course]
+        while self.level(course) > 0:
+            if not below(course):
+                course = max(c for c in self.components[self.component_of[course]] if below(c))
+                path.append(course)
+            course = max(below(course))
+            path.append(course)
+        return path
+
+
+if __name__ == "__main__":
+    import sys
+
+    catalog = load_catalog()
+    start = time.perf_counter()
+    graph = CourseGraph(catalog)
+    elapsed = time.perf_counter() - start
+    edges = sum(len(targets) for targets in graph.edges.values())
+    print(f"Built the graph of {len(graph.edges)} courses and {edges} prerequisite edges in {elapsed * 1000:.1f}ms.")
+    cycles = graph.cycles()
+    print(f"{len(graph.components)} strongly connected components, {len(cycles)} cycles"
+          + (":" if cycles else "."))
+    for cycle in cycles:
+        print(f"  {' <-> '.join(cycle)}")
+    path = graph.longest_path()
+    print(f"Longest prerequisite chain ({len(path)} courses): {' <- '.join(path)}")
+    finite = [c for c in graph.chains.values() if c != UNREACHABLE]
+    print(f"Largest closure: {max(len(c) for c in graph.closures)} courses, "
+          f"most terms needed: {max(finite):.0f}, {len(graph.chains) - len(finite)} courses unreachable.")
+
+    course = " ".join(sys.argv[1:]) or "NURS 4161"
+    if course in graph.edges:
+        closure = graph.closure(course)
+        print(f"{course}: level {graph.level(course)}, at least {graph.chains[course]:.0f} terms, "
+              f"{len(closure)} courses in its prerequisite closure:")
+        for level in range(graph.level(course) - 1, -1, -1):
+            courses = sorted(c for c in closure if graph.level(c) == level)
+            if courses:
+                print(f"  level {level}: {', '.join(courses)}")
@@ -1,89 +1,69 @@
-def print_prerequisite_node(node:dict[dict | str] | None, indent=0): # type: ignore
+from nodes import (Node, from_json, PrerequisiteGroup, ContentScoreRequirement, OtherRequirement, Unknown,
+                   ContentCollegeCourse, EquivalentCourse, ContentOtherCourse, ContentExam, ContentCollegeCredits,
+                   ContentCollegeCompletedCourses, ScoreLetter, ScorePercentage, ScoreExam, ScoreLiteral, ScoreCompletion)
+
+
+def score_string(score) -> str:
+    if isinstance(score, ScoreLetter):
+        return f'minimum "{score.min_grade}"'
+    if isinstance(score, ScorePercentage):
+        return f'minimum {score.min_percent}%'
+    if isinstance(score, ScoreExam):
+        return f'score {score.min_score}'
+    if isinstance(score, ScoreLiteral):
+        return f'score "{score.score}"'
+    if isinstance(score, ScoreCompletion):
+        return "completion"
+    return ""
+
+
+def print_prerequisite_node(node:Node | None, indent=0):
     spaces = "  " * indent
     if node is None:
         print(f"{spaces}No prerequisites.")
         return
-    
-    if 'prerequisites' in node:
-        print_prerequisite_node(node['prerequisites'])
-        return
 
-    node_type:str = node.get("type") # type: ignore
-    
     # Handle PrerequisiteGroup
-    if node_type == "PrerequisiteGroup":
-        logic = node.get("logic") # type: ignore
-        print(f"{spaces}Group ({logic}):")
-        
-        for child in node.get("children", []): # type: ignore
+    if isinstance(node, PrerequisiteGroup):
+        print(f"{spaces}Group ({node.logic}):")
+        for child in node.children:
             print_prerequisite_node(child, indent + 1)
 
     # Handle ContentScoreRequirement
-    elif node_type == "ContentScoreRequirement":
-        content = node.get("content", {})
-        score = node.get("score", {})
-        content_type = content.get("type")
-        score_str = ""
-        if score.get("type") == "ScoreLetter":
-            score_str = f'minimum "{score.get("minGrade")}"'
-        elif score.get("type") == "ScorePercentage":
-            score_str = f'minimum {score.get("minPercent")}%'
-        elif score.get("type") == "ScoreExam":
-            score_str = f'score {score.get("minScore")}'
-        elif score.get("type") == "ScoreLiteral":
-            score_str = f'score "{score.get("score")}"'
-        elif score.get("type") == "ScoreCompletion":
-            score_str = "completion"
+    elif isinstance(node, ContentScoreRequirement):
+        content = node.content
+        score_str = score_string(node.score)
 
-        if content_type == "ContentCollegeCourse":
-            subj = content.get("subject")
-            code = content.get("courseCode")
-            conc = content.get("canBeTakenConcurrently", False)
-            conc_str = " (may be taken concurrently)" if conc else ""
-            print(f'{spaces}{subj} {code}{conc_str} ({score_str})')
-        elif content_type == "EquivalentCourse":
+        if isinstance(content, ContentCollegeCourse):
+            conc_str = " (may be taken concurrently)" if content.can_be_taken_concurrently else ""
+            print(f'{spaces}{content.subject} {content.course_code}{conc_str} ({score_str})')
+        elif isinstance(content, EquivalentCourse):
             print(f'{spaces}Equivalent course ({score_str})')
-        elif content_type == "ContentOtherCourse":
-            print(f'{spaces}{content.get("course")} ({score_str})')
-        elif content_type == "ContentExam":
-            print(f'{spaces}{content.get("exam")} ({score_str})')
-        elif content_type == "ContentCollegeCredits":
-            subjects = content.get("subjects")
-            credits = content.get("credits")
-            year = content.get("year")
-            ut = content.get("universityTransferable", False)
-            subj_str = "any course" if subjects is None else ", ".join(subjects)
-            year_str = f", year {year}" if year else ""
-            ut_str = "UT " if ut else ""
-            print(f'{spaces}{credits} credits of {ut_str}{subj_str}{year_str} ({score_str})')
-        elif content_type == "ContentCollegeCompletedCourses":
-            subjects = content.get("subjects")
-            year = content.get("year")
-            ut = content.get("universityTransferable", False)
-            count = content.get("count")
-            subj_str = "any subject" if subjects is None else ", ".join(subjects)
-            year_str = f", year {year}" if year else ""
-            ut_str = "UT " if ut else ""
-            count_str = f"{count} " if count is not None else ""
+        elif isinstance(content, ContentOtherCourse):
+            print(f'{spaces}{content.course} ({score_str})')
+        elif isinstance(content, ContentExam):
+            print(f'{spaces}{content.exam} ({score_str})')
+        elif isinstance(content, ContentCollegeCredits):
+            subj_str = "any course" if content.subjects is None else ", ".join(content.subjects)
+            year_str = f", year {content.year}" if content.year else ""
+            ut_str = "UT " if content.university_transferable else ""
+            print(f'{spaces}{content.credits} credits of {ut_str}{subj_str}{year_str} ({score_str})')
+        elif isinstance(content, ContentCollegeCompletedCourses):
+            subj_str = "any subject" if content.subjects is None else ", ".join(content.subjects)
+            year_str = f", year {content.year}" if content.year else ""
+            ut_str = "UT " if content.university_transferable else ""
+            count_str = f"{content.count} " if content.count is not None else ""
             print(f'{spaces}{count_str}completed courses in {ut_str}{subj_str}{year_str} ({score_str})')
         else:
-            print(f'{spaces}Unknown ContentScoreRequirement: {content} ({score_str})')
-
-    # Handle ContentCollegeCourse (not wrapped in ContentScoreRequirement)
-    elif node_type == "ContentCollegeCourse":
-        subj = node.get("subject")
-        code = node.get("courseCode")
-        conc = node.get("canBeTakenConcurrently", False)
-        conc_str = " (may be taken concurrently)" if conc else ""
-        print(f'{spaces}{subj} {code}{conc_str}')
+            print(f'{spaces}Unknown ContentScoreRequirement: {content.to_json()} ({score_str})')
 
     # Handle OtherRequirement
-    elif node_type == "OtherRequirement":
-        print(f'{spaces}Other: {node.get("note")}')
+    elif isinstance(node, OtherRequirement):
+        print(f'{spaces}Other: {node.note}')
 
-    else:
-        print(f'{spaces}Unknown node type: {node_type}')
+    elif isinstance(node, Unknown):
+        print(f'{spaces}Unknown node type: {node.type}')
 
 
-def print_human_readable(node: dict | None):
-    print_prerequisite_node(node)
\ No newline at end of file
+def print_human_readable(result: dict | None):
+    print_prerequisite_node(from_json(result))
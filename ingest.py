@@ -0,0 +1,139 @@
+import os
+import json
+import runpy
+import tempfile
+from dataclasses import dataclass, field
+
+from journal import Journal, fsync_dir
+
+
+# Brings in a new scrape of the prerequisites. The new (subject, course code, text)
+# snapshot is diffed against data/data.py by course and by text, data/data.py and
+# data/text.py are rewritten, and conversions stay keyed by text in converted.json,
+# so every text seen before keeps its conversion. Only texts nobody has converted
+# yet are left for convert.py, which already skips everything in converted.json.
+
+DATA_PATH = "data/data.py"
+TEXT_PATH = "data/text.py"
+CONVERTED_PATH = "data/converted.json"
+
+
+@dataclass
+class SnapshotDiff:
+    # courses, as "SUBJ 1234"
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)  # same course, different text
+    # added or changed courses whose new text is one we already had, under another course
+    moved: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    # texts without a conversion that convert.py will pick up
+    new_texts: list[str] = field(default_factory=list)
+    # converted texts no course uses anymore
+    stale_texts: list[str] = field(default_factory=list)
+
+
+def load_snapshot(path:str) -> list[tuple[str, str, str]]:
+    # a JSON list of [subject, courseCode, text], or a .py file defining prerequisites like data/data.py
+    if path.endswith(".py"):
+        rows = runpy.run_path(path)["prerequisites"]
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            rows = json.load(f)
+    return [(str(subject), str(course_code), str(text)) for subject, course_code, text in rows]
+
+
+def diff_snapshots(old:list[tuple[str, str, str]], new:list[tuple[str, str, str]], converted:dict,
+                   hard_cases:list[str]) -> SnapshotDiff:
+    diff = SnapshotDiff()
+    old_text = {f"{subject} {code}": text for subject, code, text in old}
+    new_text = {f"{subject} {code}": text for subject, code, text in new}
+    old_texts = set(old_text.values())
+    for course, text in new_text.items():
+        if course not in old_text:
+            diff.added.append(course)
+        elif old_text[course] != text:
+            diff.changed.append(course)
+        else:
+            diff.unchanged.append(course)
+            continue
+        if text in old_texts:
+            diff.moved.append(course)
+    diff.removed = [course for course in old_text if course not in new_text]
+
+    skip = set(hard_cases)
+    diff.new_texts = [text for text in dict.fromkeys(new_text.values()) if text not in converted and text not in skip]
+    used = set(new_text.values())
+    diff.stale_texts = [text for text in converted if text not in used]
+    return diff
+
+
+def write_python_list(path:str, rows:list):
+    # same layout as the scraped files: one repr per line
+    lines = ["prerequisites = ["] + [f"    {row!r}," for row in rows] + ["]", ""]
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    fsync_dir(directory)
+
+
+def ingest(new:list[tuple[str, str, str]], prune:bool = False, dry_run:bool = False) -> SnapshotDiff:
+    from data.data import prerequisites as old
+    from data.text import prerequisites as old_texts
+    from data.hard_cases import hard_cases
+
+    journal = Journal(CONVERTED_PATH)
+    if dry_run:
+        with open(CONVERTED_PATH, "r", encoding="utf-8") as f:
+            converted = json.load(f)
+    else:
+        converted = journal.recover()
+    diff = diff_snapshots(old, new, converted, hard_cases)
+    if dry_run:
+        return diff
+
+    # keep text.py's order for texts still in use so the file diffs cleanly, new ones go at the end
+    used = {text for _, _, text in new}
+    texts = [text for text in old_texts if text in used]
+    kept = set(texts)
+    texts += [text for text in dict.fromkeys(t for _, _, t in new) if text not in kept]
+    write_python_list(DATA_PATH, new)
+    write_python_list(TEXT_PATH, texts)
+    if prune and diff.stale_texts:
+        for text in diff.stale_texts:
+            del converted[text]
+        journal.compact(converted)
+    return diff
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Diff a new prerequisite snapshot against data/ and bring it in.")
+    parser.add_argument("snapshot", help="JSON list of [subject, courseCode, text], or a .py file like data/data.py")
+    parser.add_argument("--dry-run", action="store_true", help="only print the diff, don't touch data/")
+    parser.add_argument("--prune", action="store_true",
+                        help="drop conversions of texts no course uses anymore (kept by default)")
+    args = parser.parse_args()
+
+    diff = ingest(load_snapshot(args.snapshot), prune=args.prune, dry_run=args.dry_run)
+    for name in ("added", "removed", "changed", "moved"):
+        courses = getattr(diff, name)
+        print(f"{len(courses)} {name}" + (f": {', '.join(courses[:10])}" if courses else "")
+              + (", ..." if len(courses) > 10 else ""))
+    print(f"{len(diff.unchanged)} unchanged.")
+    print(f"{len(diff.new_texts)} new texts to convert" + (", run convert.py." if diff.new_texts else "."))
+    for text in diff.new_texts[:10]:
+        print(f"  {text[17:97]}...")
+    if diff.stale_texts:
+        print(f"{len(diff.stale_texts)} conversions no longer used" +
+              (", dropped." if args.prune and not args.dry_run else ", kept (--prune to drop them)."))
+    if args.dry_run:
+        print("Dry run, nothing written.")
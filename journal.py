@@ -0,0 +1,98 @@
+import os
+import json
+import tempfile
+
+
+JOURNAL_PATH = "data/converted.journal.jsonl"
+
+
+def fsync_dir(path:str):
+    # make the rename itself durable (not supported on windows)
+    if os.name != "posix":
+        return
+    fd = os.open(path or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_json_atomic(path:str, data:object):
+    # write to a temp file next to the target, then rename over it
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    fsync_dir(directory)
+
+
+class Journal:
+    # Append-only log of approvals sitting next to converted.json.
+    # Each approval is one fsync'd line, compaction folds the log back into
+    # converted.json and empties it.
+
+    def __init__(self, output_path:str, path:str = JOURNAL_PATH):
+        self.output_path = output_path
+        self.path = path
+        self.file = None
+
+    def replay(self, results:dict) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        count = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                # a crash mid-append leaves at most one torn line at the end
+                if not line.endswith("\n"):
+                    print("Ignoring incomplete journal entry.")
+                    break
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    print("Ignoring corrupt journal entry.")
+                    continue
+                results[entry["text"]] = entry["result"]
+                count += 1
+        return count
+
+    def recover(self) -> dict:
+        # load converted.json and replay anything a previous session didn't compact
+        results = {}
+        if os.path.exists(self.output_path):
+            with open(self.output_path, "r", encoding="utf-8") as f:
+                results = json.load(f)
+        replayed = self.replay(results)
+        if replayed:
+            print(f"Recovered {replayed} approvals from {self.path}.")
+            self.compact(results)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+        return results
+
+    def append(self, text:str, result:object):
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.file.write(json.dumps({"text": text, "result": result}, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def compact(self, results:dict):
+        write_json_atomic(self.output_path, results)
+        # only drop the journal once converted.json is safely on disk
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+            fsync_dir(os.path.dirname(self.path))
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import threading
+from collections import defaultdict
+
+
+METRICS_PATH = "data/metrics.jsonl"
+
+# USD per million (prompt, completion) tokens, used when the provider doesn't report a cost.
+# Reasoning tokens are billed as completion tokens.
+PRICES = {
+    "google/gemini-2.5-pro": (1.25, 10.0),
+    "mistralai/mistral-7b-instruct:free": (0.0, 0.0),
+}
+
+
+def percentile(values:list[float], p:float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (k - lower)
+
+
+def estimate_cost(model:str | None, prompt_tokens:int, completion_tokens:int) -> float:
+    prompt_price, completion_price = PRICES.get(model or "", (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def usage_fields(body:dict, model:str | None) -> dict:
+    # pull token counts and cost out of an OpenRouter response body
+    usage = body.get("usage") or {}
+    prompt_tokens = usage.get("prompt_tokens", 0) or 0
+    completion_tokens = usage.get("completion_tokens", 0) or 0
+    details = usage.get("completion_tokens_details") or {}
+    cost = usage.get("cost")
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "reasoning_tokens": details.get("reasoning_tokens", 0) or 0,
+        "cost": cost if cost is not None else estimate_cost(model, prompt_tokens, completion_tokens),
+    }
+
+
+class Metrics:
+    # One JSON line per LLM call, plus the calls from this run kept in memory for the summary.
+
+    def __init__(self, path:str = METRICS_PATH):
+        self.path = path
+        self.calls: list[dict] = []
+        self.lock = threading.Lock()
+        self.file = None
+
+    def record(self, call:dict):
+        with self.lock:
+            self.calls.append(call)
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self.file = open(self.path, "a", encoding="utf-8")
+            self.file.write(json.dumps(call, ensure_ascii=False) + "\n")
+            self.file.flush()
+
+    def summary(self, wall_time:float | None = None) -> str:
+        return summarize(self.calls, wall_time)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def summarize(calls:list[dict], wall_time:float | None = None) -> str:
+    if not calls:
+        return "No LLM calls made."
+    live = [c for c in calls if not c.get("cached")]
+    walls = [c["wall"] for c in live]
+    ttfbs = [c["ttfb"] for c in live if c.get("ttfb") is not None]
+    ttfts = [c["ttft"] for c in live if c.get("ttft") is not None]
+    lines = [
+        "RUN SUMMARY:",
+        f"{len(calls)} calls ({len(calls) - len(live)} from cache), "
+        f"{sum(1 for c in calls if c['status'] == 'parse_error')} parse failures, "
+        f"{sum(1 for c in calls if c['status'] == 'invalid')} invalid, "
+        f"{sum(1 for c in calls if c['status'] == 'error')} errors, "
+        f"{sum(1 for c in calls if c['status'] == 'diverged')} aborted streams, "
+        f"{sum(c.get('retries', 0) for c in calls)} retries.",
+    ]
+    if wall_time is not None:
+        lines.append(f"Wall time {wall_time:.1f}s, {sum(walls):.1f}s spent in requests.")
+    lines.append(f"Request time p50 {percentile(walls, 50):.2f}s, p95 {percentile(walls, 95):.2f}s; "
+                 f"time to first byte p50 {percentile(ttfbs, 50):.2f}s"
+                 + (f", first token p50 {percentile(ttfts, 50):.2f}s." if ttfts else "."))
+    lines.append(f"Tokens: {sum(c.get('prompt_tokens', 0) for c in calls):,} prompt, "
+                 f"{sum(c.get('completion_tokens', 0) for c in calls):,} completion "
+                 f"({sum(c.get('reasoning_tokens', 0) for c in calls):,} reasoning). "
+                 f"Cost ~${sum(c.get('cost', 0) for c in calls):.4f}.")
+
+    by_model: dict[str, list[dict]] = defaultdict(list)
+    for c in live:
+        by_model[c.get("model") or "?"].append(c)
+    for model, model_calls in sorted(by_model.items()):
+        lines.append(f"  {model}: {len(model_calls)} calls, "
+                     f"p50 {percentile([c['wall'] for c in model_calls], 50):.2f}s, "
+                     f"${sum(c.get('cost', 0) for c in model_calls):.4f}")
+    return "\n".join(lines)
+
+
+def load(path:str = METRICS_PATH) -> list[dict]:
+    calls = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                calls.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return calls
+
+
+if __name__ == "__main__":
+    calls = load(sys.argv[1] if len(sys.argv) > 1 else METRICS_PATH)
+    print(summarize(calls))
+
+    live = [c for c in calls if not c.get("cached")]
+    print()
+    print("SLOWEST CALLS:")
+    for c in sorted(live, key=lambda c: c["wall"], reverse=True)[:10]:
+        more = f" (+{len(c['texts']) - 1} more)" if len(c["texts"]) > 1 else ""
+        print(f"  {c['wall']:7.2f}s  {c.get('model')}  {c['texts'][0][17:77]}{more}")
+    print("MOST EXPENSIVE CALLS:")
+    for c in sorted(live, key=lambda c: c.get("cost", 0), reverse=True)[:10]:
+        print(f"  ${c.get('cost', 0):.4f}  {c.get('model')}  {c['texts'][0][17:77]}")
@@ -0,0 +1,226 @@
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from batching import text_id, estimate_tokens
+
+
+# Local stand-in for the OpenRouter chat completions endpoint. It answers with the
+# approved conversions from converted.json, so the pipeline can be exercised and
+# benchmarked without an API key or paid calls.
+
+CONVERTED_PATH = "data/converted.json"
+ENDPOINT = "/api/v1/chat/completions"
+# characters per streamed chunk, roughly a few tokens
+STREAM_CHUNK = 16
+
+
+def parse_latency(spec:str):
+    # "fixed:2", "uniform:1,5" or "lognormal:MEDIAN,SIGMA" (seconds)
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        import math
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class MockOpenRouter:
+
+    def __init__(self, latency:str = "fixed:0", error_rate:float = 0, burst_rate:float = 0,
+                 burst_length:int = 10, retry_after:float = 1, corrupt_rate:float = 0,
+                 converted_path:str = CONVERTED_PATH):
+        with open(converted_path, "r", encoding="utf-8") as f:
+            converted = json.load(f)
+        self.answers = {text: (result[0] if isinstance(result, list) else result) for text, result in converted.items()}
+        self.by_id = {text_id(text): text for text in self.answers}
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.burst_rate = burst_rate
+        self.burst_length = burst_length
+        self.retry_after = retry_after
+        self.corrupt_rate = corrupt_rate
+        self.burst_left = 0
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.corrupted = 0
+
+    def answer(self, content:str) -> object:
+        if "Texts:\n" in content:
+            ids = re.findall(r"^\[(T[0-9a-f]{8})\]$", content, re.MULTILINE)
+            return {i: self.answers.get(self.by_id.get(i, ""), {"prerequisites": None}) for i in ids}
+        text = content.split("Text:\n", 1)[-1].strip()
+        return self.answers.get(text, {"prerequisites": None})
+
+    def fault(self) -> int | None:
+        # decide whether this request fails, 429 bursts affect everyone for a while
+        with self.lock:
+            self.requests += 1
+            if self.burst_left == 0 and random.random() < self.burst_rate:
+                self.burst_left = self.burst_length
+            if self.burst_left > 0:
+                self.burst_left -= 1
+                self.throttled += 1
+                return 429
+            if random.random() < self.error_rate:
+                self.errors += 1
+                return random.choice((500, 502, 503))
+        return None
+
+    def corrupt(self, output:str) -> str:
+        # a misspelled type, the kind of drift a weaker model produces
+        if random.random() >= self.corrupt_rate or '"type": "' not in output:
+            return output
+        with self.lock:
+            self.corrupted += 1
+        return output.replace('"type": "', '"type": "Content', 1)
+
+    def handle(self, body:dict) -> tuple[int, dict[str, str], bytes | list[tuple[float, bytes]]]:
+        # streamed responses come back as (delay, chunk) pairs
+        latency = self.latency()
+        stream = bool(body.get("stream"))
+        time.sleep(latency / 2 if stream else latency)
+        status = self.fault()
+        if status == 429:
+            return 429, {"Retry-After": str(self.retry_after)}, b'{"error": {"message": "Rate limited"}}'
+        if status is not None:
+            return status, {}, b'{"error": {"message": "Upstream error"}}'
+
+        messages = body.get("messages", [])
+        content = messages[-1]["content"] if messages else ""
+        output = "```json\n" + json.dumps(self.answer(content), indent=2, ensure_ascii=False) + "\n```"
+        output = self.corrupt(output)
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in messages)
+        completion_tokens = estimate_tokens(output)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        if stream:
+            return 200, {"Content-Type": "text/event-stream"}, self.events(body, output, usage, latency / 2)
+        response = {
+            "id": f"mock-{self.requests}",
+            "model": body.get("model"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": output}}],
+            "usage": usage,
+        }
+        return 200, {"Content-Type": "application/json"}, json.dumps(response, ensure_ascii=False).encode("utf-8")
+
+    def events(self, body:dict, output:str, usage:dict, duration:float) -> list[tuple[float, bytes]]:
+        # the output split into SSE chunks spread over `duration`, like a model generating it
+        pieces = [output[i:i + STREAM_CHUNK] for i in range(0, len(output), STREAM_CHUNK)]
+        delay = duration / max(1, len(pieces))
+        events = [(0.0, b": OPENROUTER PROCESSING\n\n")]
+        for n, piece in enumerate(pieces):
+            chunk = {
+                "id": f"mock-{self.requests}",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece},
+                             "finish_reason": "stop" if n == len(pieces) - 1 else None}],
+            }
+            events.append((delay, f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8")))
+        final = {"id": f"mock-{self.requests}", "model": body.get("model"), "choices": [], "usage": usage}
+        events.append((0.0, f"data: {json.dumps(final)}\n\n".encode("utf-8")))
+        events.append((0.0, b"data: [DONE]\n\n"))
+        return events
+
+    def stats(self) -> str:
+        return (f"Mock server: {self.requests} requests, {self.throttled} throttled (429), {self.errors} errors (5xx), "
+                f"{self.corrupted} corrupted answers.")
+
+
+def make_handler(mock:MockOpenRouter):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if self.path.rstrip("/") != ENDPOINT:
+                status, headers, payload = 404, {}, b'{"error": {"message": "Not found"}}'
+            else:
+                status, headers, payload = mock.handle(body)
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            if isinstance(payload, list):
+                # no length up front, the stream ends when the connection closes
+                self.send_header("Connection", "close")
+                self.close_connection = True
+                self.end_headers()
+                try:
+                    for delay, chunk in payload:
+                        time.sleep(delay)
+                        self.wfile.write(chunk)
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client aborted the stream
+                return
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(mock:MockOpenRouter, host:str = "127.0.0.1", port:int = 0) -> ThreadingHTTPServer:
+    # serves in a background thread, port 0 picks a free one
+    server = ThreadingHTTPServer((host, port), make_handler(mock))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def server_url(server:ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}{ENDPOINT}"
+
+
+def add_arguments(parser:argparse.ArgumentParser):
+    parser.add_argument("--latency", default="lognormal:2,0.5",
+                        help="fixed:S, uniform:A,B or lognormal:MEDIAN,SIGMA in seconds (default lognormal:2,0.5)")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="chance of a 5xx per request")
+    parser.add_argument("--burst-rate", type=float, default=0.01, help="chance a request starts a burst of 429s")
+    parser.add_argument("--burst-length", type=int, default=10, help="requests throttled per burst")
+    parser.add_argument("--retry-after", type=float, default=1, help="Retry-After sent with 429s, in seconds")
+    parser.add_argument("--corrupt-rate", type=float, default=0, help="chance an answer has a misspelled type")
+
+
+def mock_from_args(args:argparse.Namespace) -> MockOpenRouter:
+    return MockOpenRouter(args.latency, args.error_rate, args.burst_rate, args.burst_length, args.retry_after,
+                          args.corrupt_rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock OpenRouter server that replays converted.json.")
+    parser.add_argument("--port", type=int, default=8000)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_server(mock_from_args(args), port=args.port)
+    print(f"Serving on {server_url(server)}")
+    print(f"Point convert.py at it with OPENROUTER_URL={server_url(server)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import re
+import json
+import zlib
+import difflib
+
+import numpy as np
+
+
+# Near-duplicate prerequisite texts ("transferrable" vs "transferable", one more
+# course in a list). Each text becomes a set of character shingles, a MinHash
+# signature estimates how much two sets overlap, and LSH buckets signatures by
+# band so only texts sharing a bucket get compared: candidate pairs instead of
+# every pair. Candidates are confirmed on the exact Jaccard similarity.
+
+SHINGLE = 5
+PERMUTATIONS = 128
+BANDS = 32  # 4 rows a band, pairs above ~0.4 similarity usually share a bucket
+THRESHOLD = 0.7
+PRIME = 4294967311  # first prime above 2**32, shingle hashes are crc32s
+SEED = 0
+# words and punctuation, each with the whitespace after it
+TOKEN = re.compile(r'\s+|\w+\s*|[^\w\s]\s*')
+
+
+def shingles(text:str) -> set[int]:
+    text = " ".join(text.lower().split())
+    if text.startswith("prerequisite(s): "):
+        text = text[len("prerequisite(s): "):]
+    return {zlib.crc32(text[i:i + SHINGLE].encode("utf-8")) for i in range(max(1, len(text) - SHINGLE + 1))}
+
+
+def jaccard(a:set[int], b:set[int]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class NearDupIndex:
+
+    def __init__(self, texts:list[str]):
+        rng = np.random.default_rng(SEED)
+        self.a = rng.integers(1, 2**31, PERMUTATIONS, dtype=np.uint64)
+        self.b = rng.integers(0, 2**32, PERMUTATIONS, dtype=np.uint64)
+        self.texts: list[str] = []
+        self.ids: dict[str, int] = {}
+        self.shingles: list[set[int]] = []
+        self.buckets: list[dict[bytes, list[int]]] = [{} for _ in range(BANDS)]
+        for text in texts:
+            self.add(text)
+
+    def signature(self, shingle_set:set[int]) -> np.ndarray:
+        x = np.fromiter(shingle_set, np.uint64, len(shingle_set))
+        # (a * x + b) mod p for every permutation and shingle, the min per permutation
+        return ((self.a[:, None] * x[None, :] + self.b[:, None]) % PRIME).min(axis=1)
+
+    def add(self, text:str) -> int:
+        if text in self.ids:
+            return self.ids[text]
+        i = len(self.texts)
+        self.texts.append(text)
+        self.ids[text] = i
+        self.shingles.append(shingles(text))
+        for band, key in enumerate(self.band_keys(self.shingles[i])):
+            self.buckets[band].setdefault(key, []).append(i)
+        return i
+
+    def band_keys(self, shingle_set:set[int]) -> list[bytes]:
+        rows = self.signature(shingle_set).reshape(BANDS, -1)
+        return [row.tobytes() for row in rows]
+
+    def candidates(self, text:str) -> set[int]:
+        found: set[int] = set()
+        for band, key in enumerate(self.band_keys(shingles(text))):
+            found.update(self.buckets[band].get(key, ()))
+        found.discard(self.ids.get(text, -1))
+        return found
+
+    def neighbours(self, text:str, threshold:float = THRESHOLD) -> list[tuple[float, str]]:
+        # -> (similarity, text) for every near-duplicate, most similar first
+        own = shingles(text)
+        scored = [(jaccard(own, self.shingles[i]), self.texts[i]) for i in self.candidates(text)]
+        return sorted((s for s in scored if s[0] >= threshold), reverse=True)
+
+    def nearest_approved(self, text:str, results:dict, threshold:float = THRESHOLD) -> tuple[float, str] | None:
+        # the most similar other text that already has an approved conversion
+        return next(((score, other) for score, other in self.neighbours(text, threshold) if other in results), None)
+
+    def clusters(self, threshold:float = THRESHOLD) -> list[list[str]]:
+        # union-find over confirmed candidate pairs, only clusters of two or more
+        parent = list(range(len(self.texts)))
+
+        def find(i:int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        pairs: set[tuple[int, int]] = set()
+        for bucket in self.buckets:
+            for ids in bucket.values():
+                pairs.update((i, j) for k, i in enumerate(ids) for j in ids[k + 1:])
+        for i, j in pairs:
+            if find(i) != find(j) and jaccard(self.shingles[i], self.shingles[j]) >= threshold:
+                parent[find(j)] = find(i)
+        groups: dict[int, list[str]] = {}
+        for i, text in enumerate(self.texts):
+            groups.setdefault(find(i), []).append(text)
+        return sorted((g for g in groups.values() if len(g) > 1), key=len, reverse=True)
+
+
+def token_diff(old:str, new:str) -> str:
+    # word-level diff, removed words as [-...-] and added ones as {+...+}
+    a, b = TOKEN.findall(old), TOKEN.findall(new)
+    parts = []
+    for op, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if op == "equal":
+            parts.append("".join(a[i1:i2]))
+            continue
+        if i2 > i1:
+            parts.append(f"[-{''.join(a[i1:i2])}-]")
+        if j2 > j1:
+            parts.append(f"{{+{''.join(b[j1:j2])}+}}")
+    return "".join(parts)
+
+
+def report():
+    import time
+    from data.text import prerequisites
+    from canonical import equivalent
+
+    with open("data/converted.json", "r", encoding="utf-8") as f:
+        converted = json.load(f)
+
+    start = time.perf_counter()
+    index = NearDupIndex(prerequisites)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    clusters = index.clusters()
+    clustered = time.perf_counter() - start
+    print(f"Indexed {len(index.texts)} texts in {built * 1000:.0f}ms, clustered in {clustered * 1000:.0f}ms: "
+          f"{len(clusters)} near-duplicate clusters covering {sum(len(c) for c in clusters)} texts.")
+
+    # what LSH misses compared to checking every pair
+    start = time.perf_counter()
+    pairs = found = 0
+    for i in range(len(index.texts)):
+        candidates = index.candidates(index.texts[i])
+        for j in range(i + 1, len(index.texts)):
+            if jaccard(index.shingles[i], index.shingles[j]) >= THRESHOLD:
+                pairs += 1
+                found += j in candidates
+    brute = time.perf_counter() - start
+    print(f"All-pairs check took {brute * 1000:.0f}ms: LSH found {found} of {pairs} pairs above {THRESHOLD}.")
+
+    # leave-one-out: how often the nearest approved neighbour is already the right answer
+    approved = {text: (r[0] if isinstance(r, list) else r) for text, r in converted.items()}
+    with_neighbour = same = 0
+    for text, result in approved.items():
+        nearest = index.nearest_approved(text, approved)
+        if nearest is None:
+            continue
+        with_neighbour += 1
+        same += equivalent(approved[nearest[1]], result)
+    print(f"{with_neighbour} of {len(approved)} approved texts have an approved near-duplicate, "
+          f"whose conversion is already the right answer for {same} of them.")
+
+    if clusters:
+        cluster = clusters[0]
+        print(f"Largest cluster ({len(cluster)} texts), differences from the first:")
+        for text in cluster[1:6]:
+            print(f"  {token_diff(cluster[0], text)}")
+
+
+if __name__ == "__main__":
+    report()
@@ -0,0 +1,221 @@
+import json
+from dataclasses import dataclass
+
+
+# Typed, immutable prerequisite trees. Class names are the "type" values from
+# instructions.md, attributes are the schema fields in snake_case.
+# from_json/to_json convert to and from the dicts in converted.json.
+
+
+@dataclass(frozen=True, slots=True)
+class PrerequisiteGroup:
+    logic: str  # "AND" or "OR"
+    children: tuple["Node", ...]
+
+    def to_json(self) -> dict:
+        return {"type": "PrerequisiteGroup", "logic": self.logic, "children": [c.to_json() for c in self.children]}
+
+
+@dataclass(frozen=True, slots=True)
+class ContentScoreRequirement:
+    content: "Content"
+    score: "Score"
+
+    def to_json(self) -> dict:
+        return {"type": "ContentScoreRequirement", "content": self.content.to_json(), "score": self.score.to_json()}
+
+
+@dataclass(frozen=True, slots=True)
+class OtherRequirement:
+    note: str
+
+    def to_json(self) -> dict:
+        return {"type": "OtherRequirement", "note": self.note}
+
+
+@dataclass(frozen=True, slots=True)
+class ContentCollegeCourse:
+    subject: str
+    course_code: str
+    can_be_taken_concurrently: bool = False
+
+    def to_json(self) -> dict:
+        return {"type": "ContentCollegeCourse", "subject": self.subject, "courseCode": self.course_code,
+                "canBeTakenConcurrently": self.can_be_taken_concurrently}
+
+
+@dataclass(frozen=True, slots=True)
+class EquivalentCourse:
+
+    def to_json(self) -> dict:
+        return {"type": "EquivalentCourse"}
+
+
+@dataclass(frozen=True, slots=True)
+class ContentOtherCourse:
+    course: str
+
+    def to_json(self) -> dict:
+        return {"type": "ContentOtherCourse", "course": self.course}
+
+
+@dataclass(frozen=True, slots=True)
+class ContentExam:
+    exam: str
+
+    def to_json(self) -> dict:
+        return {"type": "ContentExam", "exam": self.exam}
+
+
+@dataclass(frozen=True, slots=True)
+class ContentCollegeCredits:
+    credits: int
+    subjects: tuple[str, ...] | None = None
+    year: int | None = None
+    university_transferable: bool = False
+
+    def to_json(self) -> dict:
+        return {"type": "ContentCollegeCredits", "subjects": list_or_none(self.subjects), "credits": self.credits,
+                "year": self.year, "universityTransferable": self.university_transferable}
+
+
+@dataclass(frozen=True, slots=True)
+class ContentCollegeCompletedCourses:
+    count: int
+    subjects: tuple[str, ...] | None = None
+    year: int | None = None
+    university_transferable: bool = False
+
+    def to_json(self) -> dict:
+        return {"type": "ContentCollegeCompletedCourses", "subjects": list_or_none(self.subjects), "count": self.count,
+                "year": self.year, "universityTransferable": self.university_transferable}
+
+
+@dataclass(frozen=True, slots=True)
+class ScoreLetter:
+    min_grade: str
+
+    def to_json(self) -> dict:
+        return {"type": "ScoreLetter", "minGrade": self.min_grade}
+
+
+@dataclass(frozen=True, slots=True)
+class ScorePercentage:
+    min_percent: int
+
+    def to_json(self) -> dict:
+        return {"type": "ScorePercentage", "minPercent": self.min_percent}
+
+
+@dataclass(frozen=True, slots=True)
+class ScoreExam:
+    min_score: float
+
+    def to_json(self) -> dict:
+        return {"type": "ScoreExam", "minScore": self.min_score}
+
+
+@dataclass(frozen=True, slots=True)
+class ScoreLiteral:
+    score: str
+
+    def to_json(self) -> dict:
+        return {"type": "ScoreLiteral", "score": self.score}
+
+
+@dataclass(frozen=True, slots=True)
+class ScoreCompletion:
+
+    def to_json(self) -> dict:
+        return {"type": "ScoreCompletion"}
+
+
+@dataclass(frozen=True, slots=True)
+class Unknown:
+    # anything off-schema, kept verbatim (as sorted JSON so it stays hashable)
+    type: str | None
+    raw: str
+
+    def to_json(self) -> dict:
+        return json.loads(self.raw)
+
+
+Node = PrerequisiteGroup | ContentScoreRequirement | OtherRequirement | Unknown
+Content = (ContentCollegeCourse | EquivalentCourse | ContentOtherCourse | ContentExam
+           | ContentCollegeCredits | ContentCollegeCompletedCourses | Unknown)
+Score = ScoreLetter | ScorePercentage | ScoreExam | ScoreLiteral | ScoreCompletion | Unknown
+
+
+def list_or_none(values:tuple[str, ...] | None) -> list[str] | None:
+    return None if values is None else list(values)
+
+
+def tuple_or_none(values:list[str] | None) -> tuple[str, ...] | None:
+    return None if values is None else tuple(values)
+
+
+def unknown(d:object) -> Unknown:
+    # d can be anything JSON holds, not just a dict
+    kind = d.get("type") if isinstance(d, dict) else None
+    return Unknown(kind if isinstance(kind, str) else None, json.dumps(d, sort_keys=True, ensure_ascii=False))
+
+
+# one loader per "type", so loading is a dict lookup instead of an if/elif chain
+LOADERS = {
+    "PrerequisiteGroup": lambda d: PrerequisiteGroup(d["logic"], tuple(load(c, NODE_CLASSES) for c in d["children"])),
+    "ContentScoreRequirement": lambda d: ContentScoreRequirement(load(d["content"], CONTENT_CLASSES),
+                                                                 load(d["score"], SCORE_CLASSES)),
+    "OtherRequirement": lambda d: OtherRequirement(d["note"]),
+    "ContentCollegeCourse": lambda d: ContentCollegeCourse(d["subject"], d["courseCode"],
+                                                           d.get("canBeTakenConcurrently", False)),
+    "EquivalentCourse": lambda d: EquivalentCourse(),
+    "ContentOtherCourse": lambda d: ContentOtherCourse(d["course"]),
+    "ContentExam": lambda d: ContentExam(d["exam"]),
+    "ContentCollegeCredits": lambda d: ContentCollegeCredits(d["credits"], tuple_or_none(d.get("subjects")),
+                                                             d.get("year"), d.get("universityTransferable", False)),
+    "ContentCollegeCompletedCourses": lambda d: ContentCollegeCompletedCourses(d["count"], tuple_or_none(d.get("subjects")),
+                                                                               d.get("year"), d.get("universityTransferable", False)),
+    "ScoreLetter": lambda d: ScoreLetter(d["minGrade"]),
+    "ScorePercentage": lambda d: ScorePercentage(d["minPercent"]),
+    "ScoreExam": lambda d: ScoreExam(d["minScore"]),
+    "ScoreLiteral": lambda d: ScoreLiteral(d["score"]),
+    "ScoreCompletion": lambda d: ScoreCompletion(),
+}
+# where a node of each type is allowed, anything else loads as Unknown
+NODE_CLASSES = (PrerequisiteGroup, ContentScoreRequirement, OtherRequirement)
+CONTENT_CLASSES = (ContentCollegeCourse, EquivalentCourse, ContentOtherCourse, ContentExam,
+                   ContentCollegeCredits, ContentCollegeCompletedCourses)
+SCORE_CLASSES = (ScoreLetter, ScorePercentage, ScoreExam, ScoreLiteral, ScoreCompletion)
+
+
+def load(d:dict, allowed:tuple[type, ...]):
+    if not isinstance(d, dict) or not isinstance(d.get("type"), str):
+        return unknown(d)
+    try:
+        node = LOADERS[d["type"]](d)
+    except (KeyError, TypeError, AttributeError):
+        return unknown(d)
+    return node if isinstance(node, allowed) else unknown(d)
+
+
+def from_json(result:dict | None) -> Node | None:
+    # {"prerequisites": ...} -> the tree, or None when there are no prerequisites
+    if result is None:
+        return None
+    if not isinstance(result, dict):
+        return unknown(result)
+    if result.get("prerequisites") is None:
+        return None
+    return load(result["prerequisites"], NODE_CLASSES)
+
+
+def to_json(node:Node | None) -> dict:
+    return {"prerequisites": None if node is None else node.to_json()}
+
+
+def load_converted(path:str = "data/converted.json") -> dict[str, Node | None]:
+    # the approved tree for every text in converted.json
+    with open(path, "r", encoding="utf-8") as f:
+        converted = json.load(f)
+    return {text: from_json(result[0] if isinstance(result, list) else result)
+            for text, result in converted.items()}
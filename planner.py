@@ -0,0 +1,231 @@
+import time
+import random
+from dataclasses import dataclass, field
+
+from nodes import (PrerequisiteGroup, ContentScoreRequirement, ContentCollegeCourse, ContentExam, ContentOtherCourse,
+                   ContentCollegeCredits, ContentCollegeCompletedCourses)
+from eligibility import YES, Transcript, load_catalog, evaluate, random_transcript
+from helpers import score_string
+from reverse_index import leaf_key, bucket_keys
+
+
+# The cheapest set of courses that gets a student into a target course. Finding
+# it is a search over the AND/OR trees: ANDs need every child, ORs branch. Each
+# subtree first gets a standalone estimate (AO* style, the best OR child marked by
+# its memoized cost), which orders the branches and gives a first plan; a depth
+# first branch-and-bound then looks for cheaper plans that share courses between
+# branches, until it has tried everything or runs out of time.
+
+# seconds, after which the best plan so far is returned
+TIME_LIMIT = 0.05
+DEFAULT_COURSE_COST = 1.0
+# writing an exam, upgrading a high school course, or earning credits in a subject (per course needed)
+EXAM_COST = 1.0
+HIGH_SCHOOL_COST = 2.0
+AGGREGATE_COURSE_COST = 1.0
+# permission, program admission and the like, a person has to approve them so courses are preferred
+OTHER_COST = 5.0
+UNPLANNABLE = float("inf")
+
+
+@dataclass
+class Plan:
+    cost: float
+    # course -> the score it's needed with, plus exams and other requirements by their reverse_index key
+    steps: dict[str, str] = field(default_factory=dict)
+    optimal: bool = True
+    expanded: int = 0
+
+
+class Planner:
+
+    def __init__(self, catalog:list[tuple[str, object]], transcript:Transcript,
+                 costs:dict[str, float] | None = None, time_limit:float = TIME_LIMIT):
+        self.trees = dict(catalog)
+        self.transcript = transcript
+        self.costs = costs or {}
+        self.time_limit = time_limit
+        self.estimates: dict[int, float] = {}
+        self.satisfied: dict[int, bool] = {}
+        # nodes whose estimate is being worked out -> how deep, and the shallowest of them
+        # the current estimate ran into through a cycle
+        self.open: dict[int, int] = {}
+        self.reached = UNPLANNABLE
+
+    def course_cost(self, course:str) -> float:
+        return self.costs.get(course, DEFAULT_COURSE_COST)
+
+    def is_satisfied(self, leaf) -> bool:
+        if id(leaf) not in self.satisfied:
+            self.satisfied[id(leaf)] = evaluate(leaf, self.transcript, {}) == YES
+        return self.satisfied[id(leaf)]
+
+    def requirement(self, leaf) -> tuple[str, float, object]:
+        # -> (step name, its own cost, the tree that has to be planned for it too)
+        content = leaf.content if isinstance(leaf, ContentScoreRequirement) else None
+        if isinstance(content, ContentCollegeCourse):
+            course = f"{content.subject} {content.course_code}"
+            # a course already on the transcript only needs retaking, its prerequisites were met
+            tree = None if course in self.transcript.courses else self.trees.get(course)
+            return course, self.course_cost(course), tree
+        if isinstance(content, (ContentExam, ContentOtherCourse)):
+            return leaf_key(content), EXAM_COST if isinstance(content, ContentExam) else HIGH_SCHOOL_COST, None  # type: ignore
+        if isinstance(content, (ContentCollegeCredits, ContentCollegeCompletedCourses)):
+            needed = content.count if isinstance(content, ContentCollegeCompletedCourses) else -(-content.credits // 3)
+            name = f"{bucket_keys(content)[0]} x{needed}"
+            return name, AGGREGATE_COURSE_COST * needed, None
+        if isinstance(leaf, ContentScoreRequirement):
+            return f"other:{score_string(leaf.score) or 'equivalent course'}", OTHER_COST, None
+        return f"other:{getattr(leaf, 'note', None) or 'off-schema requirement'}", OTHER_COST, None
+
+    def estimate(self, node) -> float:
+        # the cheapest way to satisfy a subtree on its own, shared courses counted every time
+        if node is None:
+            return 0
+        found = self.estimates.get(id(node))
+        if found is not None:
+            return found
+        depth = self.open.get(id(node))
+        if depth is not None:
+            # a cycle back to here can't help
+            self.reached = min(self.reached, depth)
+            return UNPLANNABLE
+        depth = len(self.open)
+        self.open[id(node)] = depth
+        outer, self.reached = self.reached, UNPLANNABLE
+        if isinstance(node, PrerequisiteGroup):
+            values = [self.estimate(child) for child in node.children]
+            result = sum(values) if node.logic == "AND" else min(values)
+        elif self.is_satisfied(node):
+            result = 0
+        else:
+            _, cost, tree = self.requirement(node)
+            result = cost + self.estimate(tree) if cost != UNPLANNABLE else UNPLANNABLE
+        del self.open[id(node)]
+        # a result that leaned on a cycle back to a node above this one is only right for this
+        # walk, remembering it would make later estimates depend on which target came first
+        if self.reached >= depth:
+            self.estimates[id(node)] = result
+        self.reached = min(outer, self.reached if self.reached < depth else UNPLANNABLE)
+        return result
+
+    def free(self, node, steps:dict[str, str]) -> bool:
+        # already met, or nothing more to do given the steps already planned
+        if isinstance(node, PrerequisiteGroup):
+            check = all if node.logic == "AND" else any
+            return check(self.free(child, steps) for child in node.children)
+        return self.is_satisfied(node) or self.requirement(node)[0] in steps
+
+    def bound(self, node, steps:dict[str, str]) -> float:
+        # a lower bound on what a subtree still adds: its cheapest leaf path, not counting what's below leaves
+        if isinstance(node, PrerequisiteGroup):
+            values = [self.bound(child, steps) for child in node.children]
+            return max(values) if node.logic == "AND" else min(values)
+        if self.is_satisfied(node):
+            return 0
+        name, cost, _ = self.requirement(node)
+        return 0 if name in steps else cost
+
+    def plan(self, target:str) -> Plan | None:
+        # -> the cheapest plan found for the target's prerequisites, None if there isn't one
+        # or the target isn't in the catalog
+        if target not in self.trees:
+            return None
+        tree = self.trees[target]
+        if tree is None:
+            return Plan(0)
+        if self.estimate(tree) == UNPLANNABLE:
+            return None
+        deadline = time.perf_counter() + self.time_limit
+        best: Plan | None = None
+        seen: set[tuple[frozenset, tuple]] = set()
+        # (cost so far, steps taken, requirements still open)
+        stack: list[tuple[float, dict[str, str], tuple]] = [(0, {}, (tree,))]
+        expanded = 0
+        while stack:
+            # keep going until there's at least one plan to return
+            if best is not None and time.perf_counter() > deadline:
+                best.optimal = False
+                break
+            cost, steps, pending = stack.pop()
+            expanded += 1
+            pending = list(pending)
+            branch = None
+            # settle everything that doesn't branch, stop at the first OR
+            while pending and branch is None:
+                node = pending.pop()
+                if isinstance(node, PrerequisiteGroup):
+                    if node.logic == "AND":
+                        pending += node.children
+                    elif not any(self.free(child, steps) for child in node.children):
+                        branch = node
+                elif not self.is_satisfied(node):
+                    name, step_cost, subtree = self.requirement(node)
+                    score = score_string(node.score) if isinstance(node, ContentScoreRequirement) else ""
+                    if name not in steps:
+                        steps = {**steps, name: score}
+                        cost += step_cost
+                        if subtree is not None:
+                            pending.append(subtree)
+                    elif score and score not in steps[name].split(", "):
+                        steps = {**steps, name: f"{steps[name]}, {score}"}
+            if best is not None and cost + max((self.bound(n, steps) for n in pending + [branch] if n is not None),
+                                               default=0) >= best.cost:
+                continue
+            if branch is None:
+                best = Plan(cost, steps)
+                continue
+            key = (frozenset(steps), tuple(sorted(id(n) for n in pending)) + (id(branch),))
+            if key in seen:
+                continue
+            seen.add(key)
+            # cheapest estimate on top of the stack, so it's tried first
+            for child in sorted(branch.children, key=self.estimate, reverse=True):
+                if self.estimate(child) != UNPLANNABLE:
+                    stack.append((cost, steps, tuple(pending) + (child,)))
+        if best is not None:
+            best.expanded = expanded
+        return best
+
+
+if __name__ == "__main__":
+    import sys
+
+    catalog = load_catalog()
+    rng = random.Random(0)
+    transcript = random_transcript(catalog, rng, courses=5)
+
+    target = " ".join(sys.argv[1:]) or "CPSC 2810"
+    planner = Planner(catalog, transcript)
+    start = time.perf_counter()
+    plan = planner.plan(target)
+    elapsed = time.perf_counter() - start
+    if target not in planner.trees:
+        print(f"{target} isn't in the catalog.")
+    elif plan is None:
+        print(f"No plan for {target}, it needs permission or something else that can't be planned.")
+    else:
+        print(f"{target}: {len(plan.steps)} steps, cost {plan.cost:g}, found in {elapsed * 1000:.2f}ms "
+              f"({plan.expanded} states{'' if plan.optimal else ', stopped at the time limit'}):")
+        for step, score in sorted(plan.steps.items()):
+            print(f"  {step}" + (f" ({score})" if score else ""))
+
+    # every course in the catalog from random transcripts
+    times = []
+    plans = not_optimal = cheaper = 0
+    for _ in range(20):
+        transcript = random_transcript(catalog, rng, courses=5)
+        planner = Planner(catalog, transcript)
+        for course, _ in catalog:
+            start = time.perf_counter()
+            plan = planner.plan(course)
+            times.append(time.perf_counter() - start)
+            if plan is not None:
+                plans += 1
+                not_optimal += not plan.optimal
+                cheaper += plan.cost < planner.estimate(planner.trees[course])
+    times.sort()
+    print(f"Planned {len(times)} course/transcript pairs: median {times[len(times) // 2] * 1000:.3f}ms, "
+          f"p99 {times[int(len(times) * 0.99)] * 1000:.2f}ms, max {times[-1] * 1000:.1f}ms.")
+    print(f"{plans} had a plan, {cheaper} were cheaper than the standalone estimate thanks to shared courses, "
+          f"{not_optimal} hit the {TIME_LIMIT * 1000:.0f}ms time limit.")
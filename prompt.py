@@ -0,0 +1,168 @@
+import re
+import json
+from collections import Counter
+
+from neardup import shingles
+from batching import estimate_tokens
+
+
+# Smaller prompts. instructions.md is a rules section followed by 14 worked
+# examples, all of which go out with every call. Here the rules section alone is
+# the system prompt, byte-identical on every call so providers can cache it, and
+# the user message carries only the k approved conversions whose texts are most
+# similar to the one being converted (exact Jaccard over neardup's shingles,
+# found through an inverted index).
+
+EXAMPLES_HEADING = "## Examples"
+FEW_SHOT = 4
+EXAMPLE = re.compile(r"### Example \d+\s*\*\*Text:\*\*\s*(?P<text>.+?)\s*```json\s*(?P<json>.+?)```", re.DOTALL)
+REQUEST = "Convert the following prerequisite text to JSON as per the instructions. Only output the JSON."
+
+
+def split_instructions(instructions:str) -> tuple[str, list[tuple[str, dict]]]:
+    # -> (everything before the examples, [(text, conversion), ...])
+    prefix, _, examples = instructions.partition(EXAMPLES_HEADING)
+    found = []
+    for match in EXAMPLE.finditer(examples):
+        try:
+            found.append((match["text"], json.loads(match["json"])))
+        except json.JSONDecodeError:
+            continue
+    return prefix.rstrip() + "\n", found
+
+
+class ExampleIndex:
+
+    def __init__(self, pairs:dict[str, dict]):
+        self.pairs = pairs
+        self.texts = list(pairs)
+        self.sizes: list[int] = []
+        self.postings: dict[int, list[int]] = {}
+        for i, text in enumerate(self.texts):
+            own = shingles(text)
+            self.sizes.append(len(own))
+            for shingle in own:
+                self.postings.setdefault(shingle, []).append(i)
+
+    def top(self, text:str, k:int, exclude:set[str] | frozenset = frozenset()) -> list[tuple[float, str]]:
+        # -> (Jaccard similarity, text) of the k most similar texts, only those sharing a shingle are scored
+        own = shingles(text)
+        overlap: Counter = Counter()
+        for shingle in own:
+            overlap.update(self.postings.get(shingle, ()))
+        scored = []
+        for i, shared in overlap.items():
+            other = self.texts[i]
+            if other == text or other in exclude:
+                continue
+            scored.append((shared / (len(own) + self.sizes[i] - shared), other))
+        scored.sort(reverse=True)
+        return scored[:k]
+
+
+class PromptBuilder:
+
+    def __init__(self, instructions:str, converted:dict, k:int = FEW_SHOT):
+        self.prefix, handwritten = split_instructions(instructions)
+        self.k = k
+        pairs = {text: (result[0] if isinstance(result, list) else result) for text, result in converted.items()}
+        # the hand-written examples stay candidates, approved conversions win where both exist
+        for text, result in handwritten:
+            pairs.setdefault(text, result)
+        self.index = ExampleIndex(pairs)
+
+    def examples(self, text:str, exclude:set[str] | frozenset = frozenset()) -> list[tuple[str, dict]]:
+        return [(other, self.index.pairs[other]) for _, other in self.index.top(text, self.k, exclude)]
+
+    def user_message(self, text:str, exclude:set[str] | frozenset = frozenset()) -> str:
+        parts = ["Worked examples of similar texts:"]
+        for n, (other, result) in enumerate(self.examples(text, exclude)):
+            # compact JSON, the indentation in instructions.md is a good part of its size
+            parts.append(f"### Example {n + 1}\n\n**Text:**  \n{other}\n\n```json\n"
+                         f"{json.dumps(result, ensure_ascii=False)}\n```")
+        parts.append(f"{REQUEST}\n\nText:\n{text}")
+        return "\n\n".join(parts)
+
+
+def full_message(text:str) -> str:
+    # what convert.call_openrouter sends alongside the whole of instructions.md
+    return f"{REQUEST}\n\nText:\n{text}"
+
+
+def evaluate(builder:PromptBuilder, instructions:str, held_out:list[str], approved:dict[str, dict]):
+    # Converts the held-out texts both ways and compares each answer with the approved one.
+    # Held-out texts are excluded from each other's examples, so nothing leaks its own answer.
+    import convert
+    from canonical import equivalent
+
+    exclude = set(held_out)
+    for name, system, message in (("full prompt", instructions, full_message),
+                                  (f"{builder.k} examples", builder.prefix,
+                                   lambda text: builder.user_message(text, exclude))):
+        correct = failed = 0
+        calls = len(convert.metrics.calls)
+        for text in held_out:
+            try:
+                result = convert.call_model(message(text), system, texts=[text], check=True)
+            except Exception as e:
+                print(f"  {text[17:57]}... failed: {e}")
+                failed += 1
+                continue
+            correct += equivalent(result, approved[text])
+        made = convert.metrics.calls[calls:]
+        tokens = sum(call.get("prompt_tokens", 0) for call in made)
+        print(f"{name}: {correct} of {len(held_out)} match the approved conversion, {failed} failed, "
+              f"{tokens / max(1, len(made)):,.0f} prompt tokens per call (as reported by the API).")
+
+
+if __name__ == "__main__":
+    import random
+    import argparse
+    from canonical import equivalent
+
+    parser = argparse.ArgumentParser(description="Measure few-shot prompts against the full instructions.md.")
+    parser.add_argument("-k", type=int, default=FEW_SHOT, help="examples per call")
+    parser.add_argument("--evaluate", type=int, default=0, metavar="N",
+                        help="convert N held-out approved texts with both prompts and compare (makes LLM calls)")
+    parser.add_argument("--mock", action="store_true", help="run --evaluate against mockserver.py instead")
+    args = parser.parse_args()
+
+    with open("instructions.md", "r", encoding="utf-8") as f:
+        instructions = f.read()
+    with open("data/converted.json", "r", encoding="utf-8") as f:
+        converted = json.load(f)
+    builder = PromptBuilder(instructions, converted, args.k)
+    approved = {text: (r[0] if isinstance(r, list) else r) for text, r in converted.items()}
+
+    # leave-one-out over every approved text
+    full = prefix = examples = 0
+    top_match = 0
+    for text, result in approved.items():
+        full += estimate_tokens(instructions) + estimate_tokens(full_message(text))
+        prefix += estimate_tokens(builder.prefix)
+        examples += estimate_tokens(builder.user_message(text))
+        found = builder.examples(text)
+        top_match += bool(found) and equivalent(found[0][1], result)
+    n = len(approved)
+    print(f"instructions.md: {estimate_tokens(instructions):,} tokens, rules prefix {estimate_tokens(builder.prefix):,} "
+          f"tokens, {len(split_instructions(instructions)[1])} hand-written examples, "
+          f"{len(builder.index.texts)} example candidates.")
+    print(f"Estimated input tokens per call: full prompt {full / n:,.0f}, "
+          f"{args.k} examples {(prefix + examples) / n:,.0f} ({(1 - (prefix + examples) / full) * 100:.0f}% less), "
+          f"of which {prefix / n:,.0f} is the cacheable prefix.")
+    print(f"Leaving each approved text out, its closest example already has the right answer for "
+          f"{top_match} of {n} ({top_match / n * 100:.0f}%).")
+
+    if args.evaluate:
+        import convert
+        if args.mock:
+            from client import OpenRouterClient
+            from metrics import Metrics
+            from mockserver import MockOpenRouter, start_server, server_url
+            server = start_server(MockOpenRouter())
+            convert.client = OpenRouterClient("mock", url=server_url(server))
+            # keep mock calls out of the real metrics file
+            convert.metrics = Metrics(".cache/prompt_metrics.jsonl")
+        convert.cache = None
+        held_out = random.Random(0).sample(sorted(approved), min(args.evaluate, n))
+        evaluate(builder, instructions, held_out, approved)
@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import hashlib
+
+from nodes import (from_json, PrerequisiteGroup, ContentScoreRequirement, ContentCollegeCourse, ContentExam,
+                   ContentOtherCourse, ContentCollegeCredits, ContentCollegeCompletedCourses)
+from helpers import score_string
+from eligibility import normalize
+
+
+# "If I complete CPSC 1150, what opens up?" Every leaf of every tree (a college
+# course, exam, high school course or credit bucket) maps to the courses that
+# reference it. The leaves of each prerequisite text are stored on disk with a
+# hash of its conversion, so a rebuild only re-walks texts whose conversion changed.
+
+INDEX_PATH = ".cache/reverse_index.json"
+# bump when the stored leaf format changes
+INDEX_VERSION = 2
+
+# how a leaf counts towards the course it's in
+SUFFICIENT = "sufficient"  # only ORs above it, meeting it alone is enough
+REQUIRED = "required"      # only ANDs above it, the course can't be taken without it
+PARTIAL = "partial"        # part of a mix of ANDs and ORs
+# credit and course count buckets: one course only adds to a total, whatever is above it
+COUNTS_TOWARDS = "counts towards"
+
+
+def leaf_key(content) -> str | None:
+    # "CPSC 1150", "exam:lpi", "hs:pre-calculus 12", "credits:CPSC" / "credits:*"
+    if isinstance(content, ContentCollegeCourse):
+        return f"{content.subject} {content.course_code}"
+    if isinstance(content, ContentExam):
+        return f"exam:{normalize(content.exam)}"
+    if isinstance(content, ContentOtherCourse):
+        return f"hs:{normalize(content.course)}"
+    return None
+
+
+def bucket_keys(content) -> list[str]:
+    # a credit or course count bucket is indexed under each subject it counts
+    if content.subjects is None:
+        return ["credits:*"]
+    return [f"credits:{subject.upper()}" for subject in content.subjects]
+
+
+def bucket_amount(content) -> str:
+    # what a bucket needs in total, "15 credits", "2 UT courses, year 2"
+    if isinstance(content, ContentCollegeCredits):
+        amount, unit = content.credits, "credits"
+    else:
+        amount, unit = content.count, "courses"
+    ut = "UT " if content.university_transferable else ""
+    year = f", year {content.year}" if content.year else ""
+    return f"{amount} {ut}{unit}{year}"
+
+
+def conversion_hash(result:dict | None) -> str:
+    return hashlib.sha256(json.dumps(result, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def text_leaves(result:dict | None) -> list[list]:
+    # -> [key, parent logic, role, score, concurrent, bucket total needed] for each leaf of one conversion
+    leaves = []
+
+    def walk(node, parent:str | None, ands:bool, ors:bool):
+        if isinstance(node, PrerequisiteGroup):
+            for child in node.children:
+                walk(child, node.logic, ands or node.logic == "AND", ors or node.logic == "OR")
+            return
+        if not isinstance(node, ContentScoreRequirement):
+            return
+        role = PARTIAL if ands and ors else (SUFFICIENT if not ands else REQUIRED)
+        content = node.content
+        needs = None
+        if isinstance(content, (ContentCollegeCredits, ContentCollegeCompletedCourses)):
+            keys = bucket_keys(content)
+            role, needs = COUNTS_TOWARDS, bucket_amount(content)
+        else:
+            key = leaf_key(content)
+            keys = [] if key is None else [key]
+        concurrent = isinstance(content, ContentCollegeCourse) and content.can_be_taken_concurrently
+        for key in keys:
+            leaves.append([key, parent, role, score_string(node.score), concurrent, needs])
+
+    walk(from_json(result), None, False, False)
+    return leaves
+
+
+class ReverseIndex:
+
+    def __init__(self, texts:dict[str, dict], prerequisites:list[tuple[str, str, str]]):
+        # texts: prerequisite text -> {"hash": ..., "leaves": [...]}, as stored on disk
+        self.texts = texts
+        self.unlocks: dict[str, list[dict]] = {}
+        for subject, course_code, text in prerequisites:
+            stored = texts.get(text)
+            if stored is None:
+                continue
+            course = f"{subject} {course_code}"
+            for key, logic, role, score, concurrent, needs in stored["leaves"]:
+                self.unlocks.setdefault(key, []).append({"course": course, "leaf": key, "logic": logic, "role": role,
+                                                         "score": score, "concurrent": concurrent, "needs": needs})
+
+    def lookup(self, key:str) -> list[dict]:
+        # -> the courses referencing exactly this leaf
+        return self.unlocks.get(key, [])
+
+    def opened_by(self, course:str) -> list[dict]:
+        # -> courses referencing a college course directly or through a credit bucket it counts towards
+        subject = course.partition(" ")[0].upper()
+        return self.lookup(course) + self.lookup(f"credits:{subject}") + self.lookup("credits:*")
+
+    def save(self, path:str = INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "texts": self.texts}, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+
+def build(converted_path:str = "data/converted.json", path:str | None = INDEX_PATH) -> tuple[ReverseIndex, int]:
+    # -> the index and how many texts had to be walked; reuses the stored leaves of unchanged conversions
+    from data.data import prerequisites
+
+    stored: dict[str, dict] = {}
+    if path is not None and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("version") == INDEX_VERSION:
+            stored = saved["texts"]
+
+    with open(converted_path, "r", encoding="utf-8") as f:
+        converted = json.load(f)
+    texts = {}
+    walked = 0
+    for text, result in converted.items():
+        result = result[0] if isinstance(result, list) else result
+        h = conversion_hash(result)
+        previous = stored.get(text)
+        if previous is not None and previous["hash"] == h:
+            texts[text] = previous
+        else:
+            texts[text] = {"hash": h, "leaves": text_leaves(result)}
+            walked += 1
+
+    index = ReverseIndex(texts, prerequisites)
+    if path is not None and (walked or len(texts) != len(stored)):
+        index.save(path)
+    return index, walked
+
+
+if __name__ == "__main__":
+    import sys
+
+    start = time.perf_counter()
+    index, walked = build()
+    elapsed = time.perf_counter() - start
+    print(f"Indexed {len(index.texts)} conversions ({walked} walked, the rest reused) in {elapsed * 1000:.0f}ms, "
+          f"{len(index.unlocks)} distinct leaves.")
+
+    course = " ".join(sys.argv[1:]) or "CPSC 1150"
+    start = time.perf_counter()
+    entries = index.lookup(course) if ":" in course else index.opened_by(course)
+    elapsed = time.perf_counter() - start
+    print(f"{course} is referenced by {len(entries)} courses (lookup took {elapsed * 1e6:.1f}us):")
+    for entry in sorted(entries, key=lambda e: e["course"]):
+        concurrent = ", may be taken concurrently" if entry["concurrent"] else ""
+        via = "" if entry["leaf"] == course else f" {entry['leaf']}" if entry["role"] == COUNTS_TOWARDS else f" via {entry['leaf']}"
+        details = ", ".join(part for part in (entry["needs"], entry["logic"] or "only requirement", entry["score"])
+                            if part)
+        print(f"  {entry['course']}: {entry['role']}{via} ({details}{concurrent})")
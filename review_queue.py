@@ -0,0 +1,47 @@
+import os
+import json
+
+
+REVIEW_QUEUE_PATH = "data/review_queue.jsonl"
+
+
+class ReviewQueue:
+    # Conversions that headless runs couldn't auto-accept, waiting for a person.
+    # New entries are fsync'd appends, draining rewrites the file with what's left.
+
+    def __init__(self, path:str = REVIEW_QUEUE_PATH):
+        self.path = path
+
+    def load(self) -> dict[str, list[dict[str, object]]]:
+        entries: dict[str, list[dict[str, object]]] = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                entries[entry["text"]] = entry["responses"]
+        return entries
+
+    def append(self, text:str, responses:list[dict[str, object]]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"text": text, "responses": responses}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def rewrite(self, entries:dict[str, list[dict[str, object]]]):
+        if not entries:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for text, responses in entries.items():
+                f.write(json.dumps({"text": text, "responses": responses}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
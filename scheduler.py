@@ -0,0 +1,204 @@
+import time
+import heapq
+from dataclasses import dataclass, field
+
+from nodes import PrerequisiteGroup, ContentScoreRequirement, ContentCollegeCourse
+from eligibility import YES, Transcript, load_catalog, evaluate
+from planner import Planner
+
+
+# Term-by-term plans for a set of target courses. Whatever the targets need is
+# picked by the planner, then each course's prerequisites are narrowed to the
+# ones actually used: ORs take the branch that can start earliest, and a course
+# that can be taken concurrently may share a term with the course needing it.
+# That gives every course an earliest term (critical-path layering) and a tail
+# (terms still needed after it). Terms are filled from a priority queue, longest
+# tail first, so the per-term cap delays the courses with the most slack.
+
+DEFAULT_CAP = 5
+UNSCHEDULABLE = float("inf")
+
+
+@dataclass
+class Schedule:
+    terms: list[list[str]]
+    # the longest dependency chain among the courses, no cap could make the plan shorter
+    critical_path: list[str]
+    # planned steps that aren't courses (exams, permission, ...), to sort out before the term they're needed in
+    other_steps: dict[str, str] = field(default_factory=dict)
+    # courses whose prerequisites can't all be met by the courses in the plan
+    unschedulable: list[str] = field(default_factory=list)
+
+
+class Scheduler:
+
+    def __init__(self, catalog:list[tuple[str, object]], transcript:Transcript | None = None,
+                 cap:int = DEFAULT_CAP, costs:dict[str, float] | None = None):
+        self.catalog = catalog
+        self.trees = dict(catalog)
+        self.transcript = transcript or Transcript()
+        self.cap = cap
+        self.planner = Planner(catalog, self.transcript, costs)
+
+    def courses_for(self, targets:list[str]) -> tuple[set[str], dict[str, str]]:
+        # -> courses to take, other steps
+        courses: set[str] = set()
+        other: dict[str, str] = {}
+        for target in targets:
+            if target in self.transcript.courses:
+                continue
+            courses.add(target)
+            plan = self.planner.plan(target)
+            for step, score in (plan.steps.items() if plan is not None else ()):
+                # non-course steps are named like reverse_index keys, "exam:lpi" and so on
+                if ":" not in step:
+                    courses.add(step)
+                else:
+                    other[step] = score
+        return courses, other
+
+    def earliest_terms(self, courses:set[str]) -> tuple[dict[str, float], dict[str, list[tuple[str, bool]]]]:
+        # -> earliest term of each course (0 is the first), the prerequisites (course, concurrent) it ends up using
+        earliest: dict[str, float] = {course: UNSCHEDULABLE for course in courses}
+        deps: dict[str, list[tuple[str, bool]]] = {course: [] for course in courses}
+
+        def start(node, used:list[tuple[str, bool]]) -> float:
+            # earliest term the node allows its course to start in, collecting the prerequisites it took
+            if isinstance(node, PrerequisiteGroup):
+                best, best_used = (0, []) if node.logic == "AND" else (UNSCHEDULABLE, [])
+                for child in node.children:
+                    child_used: list[tuple[str, bool]] = []
+                    value = start(child, child_used)
+                    if node.logic == "AND":
+                        best = max(best, value)
+                        best_used += child_used
+                    elif value < best:
+                        best, best_used = value, child_used
+                used += best_used if best != UNSCHEDULABLE else []
+                return best
+            if evaluate(node, self.transcript, {}) == YES:
+                return 0
+            if isinstance(node, ContentScoreRequirement) and isinstance(node.content, ContentCollegeCourse):
+                course = f"{node.content.subject} {node.content.course_code}"
+                if course not in earliest:
+                    return UNSCHEDULABLE
+                concurrent = node.content.can_be_taken_concurrently
+                used.append((course, concurrent))
+                return earliest[course] + (0 if concurrent else 1)
+            # exams, permission and so on are other steps, assumed done in time
+            return 0
+
+        # relaxed until nothing moves, like graph.chain_lengths, so cycles stay UNSCHEDULABLE
+        changed = True
+        while changed:
+            changed = False
+            for course in sorted(courses):
+                tree = self.trees.get(course)
+                used: list[tuple[str, bool]] = []
+                value = 0 if tree is None else start(tree, used)
+                if value < earliest[course]:
+                    earliest[course] = value
+                    deps[course] = used
+                    changed = True
+        return earliest, deps
+
+    def schedule(self, targets:list[str]) -> Schedule:
+        courses, other = self.courses_for(targets)
+        earliest, deps = self.earliest_terms(courses)
+        unschedulable = sorted(c for c in courses if earliest[c] == UNSCHEDULABLE)
+        courses -= set(unschedulable)
+
+        dependents: dict[str, list[tuple[str, bool]]] = {course: [] for course in courses}
+        for course in courses:
+            for dep, concurrent in deps[course]:
+                dependents[dep].append((course, concurrent))
+        # tail: terms still needed after a course starts
+        tail: dict[str, int] = {}
+
+        def tail_of(course:str) -> int:
+            if course not in tail:
+                tail[course] = max((tail_of(d) + (0 if concurrent else 1) for d, concurrent in dependents[course]),
+                                   default=0)
+            return tail[course]
+
+        for course in courses:
+            tail_of(course)
+
+        # list scheduling, one term at a time
+        waiting = {course: len(deps[course]) for course in courses}
+        ready = [(-tail[c], c) for c in courses if waiting[c] == 0]
+        heapq.heapify(ready)
+        terms: list[list[str]] = []
+        releases: list[str] = []  # dependents of courses placed this term, free from next term on
+        placed = 0
+        while placed < len(courses):
+            for course in releases:
+                waiting[course] -= 1
+                if waiting[course] == 0:
+                    heapq.heappush(ready, (-tail[course], course))
+            releases = []
+            if not ready:
+                raise ValueError(f"Courses left with prerequisites that never get scheduled: "
+                                 f"{sorted(c for c in courses if waiting[c])}")
+            term: list[str] = []
+            while ready and len(term) < self.cap:
+                _, course = heapq.heappop(ready)
+                term.append(course)
+                for dependent, concurrent in dependents[course]:
+                    if concurrent:
+                        waiting[dependent] -= 1
+                        if waiting[dependent] == 0:
+                            heapq.heappush(ready, (-tail[dependent], dependent))
+                    else:
+                        releases.append(dependent)
+            placed += len(term)
+            terms.append(sorted(term))
+
+        return Schedule(terms, self.critical_path(earliest, deps, courses), other, unschedulable)
+
+    def critical_path(self, earliest:dict[str, float], deps:dict[str, list[tuple[str, bool]]],
+                      courses:set[str]) -> list[str]:
+        # latest course first, following whichever prerequisite set its earliest term
+        if not courses:
+            return []
+        course = max(sorted(courses), key=lambda c: earliest[c])
+        path = [course]
+        while deps[course]:
+            course = max(deps[course], key=lambda d: (earliest[d[0]] + (0 if d[1] else 1), d[0]))[0]
+            path.append(course)
+        return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Plan the terms needed to take a set of courses.")
+    parser.add_argument("targets", nargs="*", default=["CPSC 2810", "NURS 4161"], help="courses to end up taking")
+    parser.add_argument("--cap", type=int, default=DEFAULT_CAP, help="most courses per term")
+    args = parser.parse_args()
+
+    catalog = load_catalog()
+    scheduler = Scheduler(catalog, cap=args.cap)
+    start = time.perf_counter()
+    schedule = scheduler.schedule(args.targets)
+    elapsed = time.perf_counter() - start
+    print(f"{len(schedule.terms)} terms at up to {args.cap} courses a term, planned in {elapsed * 1000:.1f}ms:")
+    for i, term in enumerate(schedule.terms):
+        print(f"  term {i + 1}: {', '.join(term)}")
+    courses = sum(len(term) for term in schedule.terms)
+    print(f"Critical path ({len(schedule.critical_path)} courses): {' <- '.join(schedule.critical_path)}")
+    print(f"No plan can be shorter than the critical path, or than {-(-courses // args.cap)} terms "
+          f"for {courses} courses at {args.cap} a term.")
+    if schedule.other_steps:
+        print(f"Also needed: {', '.join(f'{k} ({v})' if v else k for k, v in schedule.other_steps.items())}")
+    if schedule.unschedulable:
+        print(f"Can't be scheduled: {', '.join(schedule.unschedulable)}")
+
+    # a whole program: every course in a few subjects
+    targets = [course for course, _ in catalog if course.split()[0] in ("CPSC", "MATH", "STAT")]
+    start = time.perf_counter()
+    schedule = Scheduler(catalog, cap=args.cap).schedule(targets)
+    elapsed = time.perf_counter() - start
+    print(f"Whole-program check: {len(targets)} CPSC/MATH/STAT targets, "
+          f"{sum(len(t) for t in schedule.terms)} courses in {len(schedule.terms)} terms "
+          f"(critical path {len(schedule.critical_path)}) in {elapsed * 1000:.0f}ms.")
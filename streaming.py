@@ -0,0 +1,275 @@
+import re
+import json
+import time
+from typing import Iterator
+
+from validator import NODE_TYPES, CONTENT_TYPES, SCORE_TYPES, UNIONS, compile_spec
+
+
+# Incremental checking of a streamed conversion, so a generation that goes off the
+# rails can be cut short instead of paid for in full.
+
+FIELDS = {name: {"type", *fields} for types in UNIONS.values() for name, fields in types.items()}
+ALL_FIELDS = set().union(*FIELDS.values())
+# what kind of object may sit under each key
+CONTEXT_TYPES = {
+    "prerequisites": set(NODE_TYPES),
+    "children": set(NODE_TYPES),
+    "content": set(CONTENT_TYPES),
+    "score": set(SCORE_TYPES),
+}
+# plain-valued fields, ScoreLiteral's "score" is handled separately
+SCALAR_CHECKS = {
+    key: check.accepts  # type: ignore
+    for types in UNIONS.values() for fields in types.values() for key, spec in fields.items()
+    if key not in CONTEXT_TYPES and hasattr(check := compile_spec(spec, {}), "accepts")
+}
+
+NUMBER = re.compile(r"-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?")
+LITERALS = {"true": True, "false": False, "null": None}
+FENCE = re.compile(r"\s*```[a-z]*[ \t]*\r?\n")
+NUMBER_CHARS = re.compile(r"[-+0-9.eE]*")
+
+
+class StreamDiverged(Exception):
+    pass
+
+
+class Frame:
+    __slots__ = ("kind", "state", "context", "key", "keys", "type")
+
+    def __init__(self, kind:str, context:str | None):
+        self.kind = kind          # "object" or "array"
+        self.state = "first"      # where we are inside it
+        self.context = context    # key this container is the value of
+        self.key: str | None = None
+        self.keys: set[str] = set()
+        self.type: str | None = None
+
+
+class StreamValidator:
+    # Feed it content chunks as they arrive. Raises StreamDiverged as soon as the
+    # prefix can no longer become a valid conversion.
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.stack: list[Frame] = []
+        self.started = False
+        self.done = False
+
+    def feed(self, chunk:str):
+        self.buffer += chunk
+        if not self.started:
+            stripped = self.buffer.lstrip()
+            if not stripped:
+                return
+            if stripped.startswith("`"):
+                # wait for the whole opening fence
+                match = FENCE.match(self.buffer)
+                if match is None:
+                    if "\n" in stripped:
+                        raise StreamDiverged("Unexpected text after code fence.")
+                    return
+                self.pos = match.end()
+            else:
+                self.pos = len(self.buffer) - len(stripped)
+            self.started = True
+        self.scan()
+
+    def scan(self):
+        buffer = self.buffer
+        while not self.done:
+            while self.pos < len(buffer) and buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos >= len(buffer):
+                return
+            c = buffer[self.pos]
+            if c in "{}[],:":
+                self.pos += 1
+                self.punctuation(c)
+            elif c == '"':
+                end = self.pos + 1
+                while True:
+                    end = buffer.find('"', end)
+                    if end == -1:
+                        return
+                    backslashes = 0
+                    while buffer[end - 1 - backslashes] == "\\":
+                        backslashes += 1
+                    if backslashes % 2 == 0:
+                        break
+                    end += 1
+                value = json.loads(buffer[self.pos:end + 1])
+                self.pos = end + 1
+                self.string(value)
+            elif c == "-" or c.isdigit():
+                end = NUMBER_CHARS.match(buffer, self.pos).end()  # type: ignore
+                if end == len(buffer):
+                    return
+                if not NUMBER.fullmatch(buffer, self.pos, end):
+                    raise StreamDiverged(f"Bad number at {self.pos}.")
+                number = json.loads(buffer[self.pos:end])
+                self.pos = end
+                self.value(number)
+            elif c in "tfn":
+                for word, value in LITERALS.items():
+                    if buffer.startswith(word, self.pos):
+                        self.pos += len(word)
+                        self.value(value)
+                        break
+                    if word.startswith(buffer[self.pos:]):
+                        return
+                else:
+                    raise StreamDiverged(f"Unexpected literal at {self.pos}.")
+            else:
+                raise StreamDiverged(f"Unexpected character {c!r} at {self.pos}.")
+
+    def punctuation(self, c:str):
+        frame = self.stack[-1] if self.stack else None
+        if c in "{[":
+            self.open("object" if c == "{" else "array")
+        elif c == "}":
+            if frame is None or frame.kind != "object" or frame.state not in ("first", "after_value"):
+                raise StreamDiverged("Unexpected '}'.")
+            if frame.context in CONTEXT_TYPES and frame.type is None:
+                raise StreamDiverged(f"Object under '{frame.context}' has no type.")
+            self.close()
+        elif c == "]":
+            if frame is None or frame.kind != "array" or frame.state not in ("first", "after_value"):
+                raise StreamDiverged("Unexpected ']'.")
+            self.close()
+        elif c == ",":
+            if frame is None or frame.state != "after_value":
+                raise StreamDiverged("Unexpected ','.")
+            frame.state = "key" if frame.kind == "object" else "value"
+        elif c == ":":
+            if frame is None or frame.kind != "object" or frame.state != "colon":
+                raise StreamDiverged("Unexpected ':'.")
+            frame.state = "value"
+
+    def expect_value(self) -> str | None:
+        # -> the key the next value belongs to
+        if not self.stack:
+            if self.done:
+                raise StreamDiverged("Content after the end of the JSON.")
+            return None
+        frame = self.stack[-1]
+        if frame.kind == "object":
+            if frame.state != "value":
+                raise StreamDiverged("Value where a key was expected.")
+            return frame.key
+        if frame.state not in ("first", "value"):
+            raise StreamDiverged("Missing ',' in array.")
+        return frame.context
+
+    def open(self, kind:str):
+        context = self.expect_value()
+        if not self.stack and kind != "object":
+            raise StreamDiverged("Conversion must be a JSON object.")
+        if kind == "object" and context in SCALAR_CHECKS:
+            raise StreamDiverged(f"'{context}' can't be an object.")
+        if kind == "array" and context not in ("children", "subjects"):
+            raise StreamDiverged(f"'{context}' can't be a list.")
+        self.stack.append(Frame(kind, context))
+
+    def close(self):
+        self.stack.pop()
+        if self.stack:
+            self.stack[-1].state = "after_value"
+        else:
+            self.done = True
+
+    def string(self, value:str):
+        frame = self.stack[-1] if self.stack else None
+        if frame is not None and frame.kind == "object" and frame.state in ("first", "key"):
+            self.key(frame, value)
+        else:
+            self.value(value)
+
+    def key(self, frame:Frame, key:str):
+        if len(self.stack) == 1:
+            if key != "prerequisites":
+                raise StreamDiverged(f"Unexpected top-level key '{key}'.")
+        elif key not in ALL_FIELDS or (frame.type is not None and key not in FIELDS[frame.type]):
+            raise StreamDiverged(f"Unexpected key '{key}' in {frame.type or 'object'}.")
+        if key in frame.keys:
+            raise StreamDiverged(f"Duplicate key '{key}'.")
+        frame.keys.add(key)
+        frame.key = key
+        frame.state = "colon"
+
+    def value(self, value:object):
+        key = self.expect_value()
+        frame = self.stack[-1] if self.stack else None
+        if frame is None:
+            raise StreamDiverged("Conversion must be a JSON object.")
+        if key == "type" and frame.kind == "object":
+            allowed = CONTEXT_TYPES.get(frame.context or "", set())
+            if value not in allowed:
+                raise StreamDiverged(f"'{value}' is not allowed under '{frame.context}'.")
+            extra = frame.keys - FIELDS[value]  # type: ignore
+            if extra:
+                raise StreamDiverged(f"{value} can't have {sorted(extra)}.")
+            frame.type = value  # type: ignore
+        elif key == "prerequisites" and value is not None:
+            raise StreamDiverged("'prerequisites' must be an object or null.")
+        elif key in SCALAR_CHECKS and not SCALAR_CHECKS[key](value):
+            raise StreamDiverged(f"Bad value {value!r} for '{key}'.")
+        elif key in ("content", "children") or (key == "score" and frame.context != "score"):
+            # ScoreLiteral's own "score" is the only plain value under these keys
+            raise StreamDiverged(f"'{key}' must be an object.")
+        frame.state = "after_value"
+
+
+def iter_sse(response) -> Iterator[dict]:
+    # yields the JSON payload of each server-sent event
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or line.startswith(":"):
+            # blank separators and keep-alive comments
+            continue
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        yield json.loads(data)
+
+
+def read_stream(response, validator:StreamValidator | None = None, stats:dict | None = None) -> str:
+    # Reads a streamed completion, checking the content as it arrives. Puts the time to
+    # the first token into stats["ttft"] and returns the body a non-streamed request
+    # would have returned, so it can be parsed and cached the same way.
+    start = time.perf_counter()
+    content: list[str] = []
+    usage = None
+    model = None
+    finish_reason = None
+    try:
+        for event in iter_sse(response):
+            if "error" in event:
+                raise RuntimeError(f"Stream failed: {event['error'].get('message', event['error'])}")
+            model = event.get("model", model)
+            usage = event.get("usage") or usage
+            for choice in event.get("choices", []):
+                delta = choice.get("delta") or {}
+                if stats is not None and stats.get("ttft") is None and (delta.get("content") or delta.get("reasoning")):
+                    stats["ttft"] = stats.get("ttfb", 0) + time.perf_counter() - start
+                if delta.get("content"):
+                    content.append(delta["content"])
+                    if validator is not None:
+                        validator.feed(delta["content"])
+                finish_reason = choice.get("finish_reason") or finish_reason
+    finally:
+        # on an abort this drops the connection, which stops the generation
+        response.close()
+    if validator is not None and not validator.done:
+        raise StreamDiverged("Stream ended before the JSON did.")
+    body = {
+        "model": model,
+        "choices": [{"index": 0, "finish_reason": finish_reason,
+                     "message": {"role": "assistant", "content": "".join(content)}}],
+    }
+    if usage is not None:
+        body["usage"] = usage
+    return json.dumps(body, ensure_ascii=False)
@@ -0,0 +1,150 @@
+import re
+import json
+
+
+# Reuse approved conversions for texts that only differ in course references, grades and numbers.
+# 'A minimum "C" grade in DSGN 1150.' and 'A minimum "C+" grade in WMDD 4850.' share the
+# template 'A minimum "<grade>" grade in <subject> <code>.', so one approved tree can be
+# re-instantiated for the other by swapping the slot values.
+
+SLOT = re.compile(
+    r'(?P<subject>\b[A-Z]{3,4}(?= \d{4}\b))'
+    r'|(?P<code>\b\d{4}\b)'
+    r'|"(?P<grade>[A-D][+-]?|F)"'
+    r'|"(?P<literal>S|SR|P)"'
+    r'|(?P<number>\b\d{1,3}(?:\.\d+)?\b)'
+)
+
+# which slot kind each field of the schema is filled from
+# (ScoreLiteral scores can also be exam levels, which are numbers)
+FIELD_KINDS = {
+    "subject": "subject",
+    "courseCode": "code",
+    "minGrade": "grade",
+    "score": "literal",
+    "minPercent": "number",
+    "minScore": "number",
+    "credits": "number",
+    "count": "number",
+}
+FREE_TEXT_FIELDS = {"course", "exam", "note"}
+
+
+class TemplateMismatch(Exception):
+    pass
+
+
+def abstract(text:str) -> tuple[str, list[tuple[str, str]]]:
+    # -> (template, [(kind, value), ...] in order of appearance)
+    slots: list[tuple[str, str]] = []
+
+    def replace(match:re.Match) -> str:
+        kind = match.lastgroup
+        assert kind is not None
+        slots.append((kind, match[kind]))
+        return "{" + kind + "}"
+
+    return SLOT.sub(replace, text), slots
+
+
+def same_value(a:object, b:str) -> bool:
+    if isinstance(a, bool):
+        return False
+    if isinstance(a, (int, float)):
+        try:
+            return float(b) == a
+        except ValueError:
+            return False
+    return a == b
+
+
+def substitute(node:object, old:list[tuple[str, str]], new:list[tuple[str, str]], field:str | None = None) -> object:
+    if isinstance(node, dict):
+        return {key: substitute(value, old, new, key) for key, value in node.items()}
+    if isinstance(node, list):
+        return [substitute(value, old, new) for value in node]
+    if field in FREE_TEXT_FIELDS and isinstance(node, str):
+        # only safe to copy if it doesn't mention anything that changed
+        for (_, value), (_, new_value) in zip(old, new):
+            if value != new_value and re.search(rf"\b{re.escape(value)}\b", node):
+                raise TemplateMismatch(node)
+        return node
+
+    kind = FIELD_KINDS.get(field or "")
+    if kind is None:
+        return node
+    kinds = (kind, "number") if kind == "literal" else (kind,)
+    indices = [i for i, (k, value) in enumerate(old) if k in kinds and same_value(node, value)]
+    if not indices:
+        # a constant, e.g. a score that isn't written in the text
+        return node
+    values = {new[i][1] for i in indices}
+    if len(values) != 1:
+        raise TemplateMismatch(f"{field} maps to slots with different values")
+    value = values.pop()
+    if isinstance(node, bool) or not isinstance(node, (int, float)):
+        return value
+    if isinstance(node, int) and float(value).is_integer():
+        return int(float(value))
+    return float(value)
+
+
+class TemplateIndex:
+
+    def __init__(self, results:dict | None = None):
+        self.templates: dict[str, list[tuple[str, dict]]] = {}
+        for text, result in (results or {}).items():
+            self.add(text, result)
+
+    def add(self, text:str, result:dict | list):
+        if isinstance(result, list):
+            result = result[0]
+        template, _ = abstract(text)
+        self.templates.setdefault(template, []).append((text, result))
+
+    def instantiate(self, text:str, exclude:str | None = None) -> tuple[str, dict] | None:
+        # -> (source text, converted result) from the first approved text with the same template
+        template, slots = abstract(text)
+        for source, result in self.templates.get(template, []):
+            if source == exclude:
+                continue
+            _, source_slots = abstract(source)
+            try:
+                return source, substitute(result, source_slots, slots)  # type: ignore
+            except TemplateMismatch:
+                continue
+        return None
+
+
+def report():
+    from data.text import prerequisites
+    from data.hard_cases import hard_cases
+
+    with open("data/converted.json", "r", encoding="utf-8") as f:
+        converted = json.load(f)
+    index = TemplateIndex(converted)
+
+    pending = [text for text in prerequisites if text not in converted and text not in hard_cases]
+    pending_hits = sum(1 for text in pending if index.instantiate(text) is not None)
+
+    # leave-one-out over the approved texts: what a full re-conversion would skip
+    hits = matched = 0
+    for text, approved in converted.items():
+        found = index.instantiate(text, exclude=text)
+        if found is None:
+            continue
+        hits += 1
+        if isinstance(approved, list):
+            approved = approved[0]
+        if found[1] == approved:
+            matched += 1
+
+    print(f"{len(index.templates)} templates over {len(converted)} approved texts.")
+    print(f"{pending_hits} out of {len(pending)} pending texts can be instantiated from a template.")
+    print(f"A full re-conversion would skip {hits} out of {len(converted)} LLM calls ({hits / len(converted) * 100:.1f}%).")
+    if hits:
+        print(f"{matched} out of {hits} instantiations match the approved conversion ({matched / hits * 100:.1f}%).")
+
+
+if __name__ == "__main__":
+    report()
@@ -0,0 +1,189 @@
+import sys
+import json
+import time
+from typing import Callable
+
+
+# Schema checks for converted prerequisites. The tables below mirror the JSON blocks
+# in instructions.md, written in the same notation, and get compiled once into
+# plain functions so checking a response is cheap enough to do on every one.
+
+NODE_TYPES = {
+    "PrerequisiteGroup": {"logic": '"AND" | "OR"', "children": "[PrerequisiteNode]"},
+    "ContentScoreRequirement": {"content": "ContentType", "score": "ScoreType"},
+    "OtherRequirement": {"note": "string"},
+}
+CONTENT_TYPES = {
+    "ContentCollegeCourse": {"subject": "string", "courseCode": "string", "canBeTakenConcurrently": "bool"},
+    "EquivalentCourse": {},
+    "ContentOtherCourse": {"course": "string"},
+    "ContentExam": {"exam": "string"},
+    "ContentCollegeCredits": {"credits": "int", "year": "int | null", "universityTransferable": "bool",
+                              "subjects": "[string] | null"},
+    "ContentCollegeCompletedCourses": {"subjects": "[string] | null", "count": "int", "year": "int | null",
+                                       "universityTransferable": "bool"},
+}
+SCORE_TYPES = {
+    "ScoreLetter": {"minGrade": "string"},
+    "ScorePercentage": {"minPercent": "int"},
+    "ScoreExam": {"minScore": "float"},
+    "ScoreLiteral": {"score": "string"},
+    "ScoreCompletion": {},
+}
+UNIONS = {
+    "PrerequisiteNode": NODE_TYPES,
+    "ContentType": CONTENT_TYPES,
+    "ScoreType": SCORE_TYPES,
+}
+TOP_LEVEL = {"prerequisites": "PrerequisiteNode | null"}
+
+# check(value, path, errors) appends "path: message" strings for anything wrong
+Check = Callable[[object, str, list], None]
+
+
+def scalar(name:str, test:Callable[[object], bool]) -> Check:
+    def check(value, path, errors):
+        if not test(value):
+            errors.append(f"{path}: expected {name}, got {json.dumps(value, ensure_ascii=False)[:40]}")
+    check.accepts = test  # type: ignore
+    return check
+
+
+SCALARS = {
+    "string": lambda v: isinstance(v, str),
+    "int": lambda v: type(v) is int,
+    "float": lambda v: type(v) in (int, float),
+    "bool": lambda v: type(v) is bool,
+    "null": lambda v: v is None,
+}
+
+
+def compile_spec(spec:str, compiled:dict[str, Check]) -> Check:
+    # turns one field spec like "[string] | null" into a check function
+    options = [s.strip() for s in spec.split("|")]
+    if len(options) > 1:
+        if all(o.startswith('"') for o in options):
+            allowed = {json.loads(o) for o in options}
+            return scalar(spec, lambda v: v in allowed)
+        checks = [compile_spec(o, compiled) for o in options]
+        if all(hasattr(c, "accepts") for c in checks):
+            tests = [c.accepts for c in checks]  # type: ignore
+            return scalar(spec, lambda v: any(t(v) for t in tests))
+        # a union with lists or node types: take the first option that fits,
+        # otherwise report against the one that isn't a plain scalar
+        def check_union(value, path, errors):
+            best = None
+            for c in checks:
+                option_errors: list[str] = []
+                c(value, path, option_errors)
+                if not option_errors:
+                    return
+                if best is None and not hasattr(c, "accepts"):
+                    best = option_errors
+            errors.extend(best or [f"{path}: expected {spec}, got {json.dumps(value, ensure_ascii=False)[:40]}"])
+        return check_union
+
+    spec = options[0]
+    if spec.startswith("[") and spec.endswith("]"):
+        item = compile_spec(spec[1:-1], compiled)
+        def check_list(value, path, errors):
+            if not isinstance(value, list):
+                errors.append(f"{path}: expected a list")
+                return
+            for i, v in enumerate(value):
+                item(v, f"{path}[{i}]", errors)
+        return check_list
+    if spec in SCALARS:
+        return scalar(spec, SCALARS[spec])
+    if spec in UNIONS:
+        # looked up at call time so the node types can refer to each other
+        def check_ref(value, path, errors):
+            compiled[spec](value, path, errors)
+        return check_ref
+    raise ValueError(f"Unknown schema type: {spec}")
+
+
+def compile_object(fields:dict[str, Check], path_name:str | None = None) -> Check:
+    required = set(fields)
+    items = list(fields.items())
+    def check(value, path, errors):
+        if not isinstance(value, dict):
+            errors.append(f"{path}: expected an object")
+            return
+        for key in value.keys() - required:
+            if key != "type":
+                errors.append(f"{path}.{key}: unexpected field{f' in {path_name}' if path_name else ''}")
+        for key, field in items:
+            if key in value:
+                field(value[key], f"{path}.{key}", errors)
+            else:
+                errors.append(f"{path}: {path_name or 'object'} is missing '{key}'")
+    return check
+
+
+def compile_union(name:str, types:dict[str, dict[str, str]], compiled:dict[str, Check]) -> Check:
+    by_type = {t: compile_object({k: compile_spec(s, compiled) for k, s in fields.items()}, t)
+               for t, fields in types.items()}
+    def check(value, path, errors):
+        if not isinstance(value, dict):
+            errors.append(f"{path}: expected a {name} object")
+            return
+        kind = value.get("type")
+        node = by_type.get(kind)  # type: ignore
+        if node is None:
+            errors.append(f"{path}.type: {json.dumps(kind)} is not a {name} ({', '.join(types)})")
+            return
+        node(value, path, errors)
+    return check
+
+
+def compile_schema() -> Check:
+    compiled: dict[str, Check] = {}
+    for name, types in UNIONS.items():
+        compiled[name] = compile_union(name, types, compiled)
+    return compile_object({k: compile_spec(s, compiled) for k, s in TOP_LEVEL.items()})
+
+
+check_result = compile_schema()
+
+
+def validate(result:object) -> list[str]:
+    # -> every problem with a conversion, as "path: message"
+    errors: list[str] = []
+    check_result(result, "$", errors)
+    return errors
+
+
+def is_valid(result:object) -> bool:
+    return not validate(result)
+
+
+def validate_all(converted:dict[str, object]) -> dict[str, list[str]]:
+    # errors by text for the approved answers in a converted.json
+    problems: dict[str, list[str]] = {}
+    for text, result in converted.items():
+        if isinstance(result, list):
+            # the first one is the approved answer
+            result = result[0]
+        errors = validate(result)
+        if errors:
+            problems[text] = errors
+    return problems
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "data/converted.json"
+    with open(path, "r", encoding="utf-8") as f:
+        converted = json.load(f)
+    start = time.perf_counter()
+    problems = validate_all(converted)
+    elapsed = time.perf_counter() - start
+
+    for text, errors in problems.items():
+        print(text[:100])
+        for error in errors:
+            print(f"    {error}")
+    print()
+    print(f"{len(problems)} of {len(converted)} conversions have schema errors "
+          f"({sum(len(e) for e in problems.values())} errors).")
+    print(f"Checked in {elapsed * 1000:.1f}ms, {elapsed / len(converted) * 1e6:.0f}us per conversion.")
@@ -0,0 +1,208 @@
+import time
+import random
+
+from nodes import (PrerequisiteGroup, ContentScoreRequirement, ContentExam, ContentOtherCourse, ContentCollegeCredits,
+                   ContentCollegeCompletedCourses)
+from eligibility import NO, MANUAL, YES, GRADES, Transcript, load_catalog, eligibility, evaluate, random_transcript
+from reverse_index import leaf_key, bucket_keys
+
+
+# What-if eligibility for one transcript. Every node of the catalog keeps its
+# current result, and every group keeps how many of its children are NO / MANUAL /
+# YES, so its own result is the lowest (AND) or highest (OR) non-zero count. An
+# edit re-evaluates only the leaves that mention what changed and pushes the
+# difference up through their parents, stopping wherever a result doesn't change.
+
+
+class WhatIf:
+
+    def __init__(self, catalog:list[tuple[str, object]], transcript:Transcript):
+        self.catalog = catalog
+        self.transcript = transcript
+        self.nodes: dict[int, object] = {}  # id -> node, keeps them alive
+        self.values: dict[int, int] = {}
+        self.counts: dict[int, list[int]] = {}  # id(group) -> [NO, MANUAL, YES] children
+        self.parents: dict[int, list[int]] = {}
+        self.courses_of: dict[int, list[str]] = {}  # id(root) -> courses it's the tree of
+        self.leaves: dict[str, list[int]] = {}  # reverse_index key -> leaf ids
+        for course, tree in catalog:
+            if tree is not None:
+                self.add(tree)
+                self.courses_of.setdefault(id(tree), []).append(course)
+        self.status = {course: YES if tree is None else self.values[id(tree)] for course, tree in catalog}
+
+    def add(self, node) -> int:
+        # full evaluation, no short-circuit, so every node has a value to update from
+        if id(node) in self.values:
+            return self.values[id(node)]
+        self.nodes[id(node)] = node
+        if isinstance(node, PrerequisiteGroup):
+            counts = [0, 0, 0]
+            for child in node.children:
+                counts[self.add(child)] += 1
+                self.parents.setdefault(id(child), []).append(id(node))
+            self.counts[id(node)] = counts
+            value = self.combine(node, counts)
+        else:
+            if isinstance(node, ContentScoreRequirement):
+                content = node.content
+                if isinstance(content, (ContentCollegeCredits, ContentCollegeCompletedCourses)):
+                    keys = bucket_keys(content)
+                else:
+                    key = leaf_key(content)
+                    keys = [] if key is None else [key]
+                for key in keys:
+                    self.leaves.setdefault(key, []).append(id(node))
+            value = evaluate(node, self.transcript, {})
+        self.values[id(node)] = value
+        return value
+
+    def combine(self, node:PrerequisiteGroup, counts:list[int]) -> int:
+        order = (NO, MANUAL, YES) if node.logic == "AND" else (YES, MANUAL, NO)
+        return next(value for value in order if counts[value])
+
+    def propagate(self, keys:list[str]) -> dict[str, tuple[int, int]]:
+        # -> {course: (before, after)} for the courses whose result changed
+        stack: list[tuple[int, int, int]] = []  # (node id, value before, value after) for each change
+        seen: set[int] = set()
+        for key in keys:
+            for leaf in self.leaves.get(key, []):
+                if leaf in seen:
+                    continue
+                seen.add(leaf)
+                value = evaluate(self.nodes[leaf], self.transcript, {})
+                if value != self.values[leaf]:
+                    stack.append((leaf, self.values[leaf], value))
+                    self.values[leaf] = value
+        roots: set[int] = set()
+        while stack:
+            node, before, after = stack.pop()
+            if node in self.courses_of:
+                roots.add(node)
+            for parent in self.parents.get(node, ()):
+                counts = self.counts[parent]
+                counts[before] -= 1
+                counts[after] += 1
+                value = self.combine(self.nodes[parent], counts)  # type: ignore
+                if value != self.values[parent]:
+                    stack.append((parent, self.values[parent], value))
+                    self.values[parent] = value
+        flipped = {}
+        for root in roots:
+            for course in self.courses_of[root]:
+                if self.values[root] != self.status[course]:
+                    flipped[course] = (self.status[course], self.values[root])
+                    self.status[course] = self.values[root]
+        return flipped
+
+    # edits, each returns the courses whose eligibility flipped
+
+    def set_grade(self, course:str, grade:str | None) -> dict[str, tuple[int, int]]:
+        if grade is None:
+            self.transcript.courses.pop(course, None)
+        else:
+            self.transcript.courses[course] = grade
+        self.transcript.refresh()
+        return self.propagate([course] + self.buckets(course))
+
+    def set_in_progress(self, course:str, registered:bool = True) -> dict[str, tuple[int, int]]:
+        if registered:
+            self.transcript.in_progress.add(course)
+        else:
+            self.transcript.in_progress.discard(course)
+        return self.propagate([course])
+
+    def set_credits(self, course:str, credits:float | None) -> dict[str, tuple[int, int]]:
+        # None goes back to DEFAULT_CREDITS
+        if credits is None:
+            self.transcript.credits.pop(course, None)
+        else:
+            self.transcript.credits[course] = credits
+        self.transcript.refresh()
+        return self.propagate(self.buckets(course))
+
+    def set_transferable(self, course:str, transferable:bool = True) -> dict[str, tuple[int, int]]:
+        if transferable:
+            self.transcript.non_transferable.discard(course)
+        else:
+            self.transcript.non_transferable.add(course)
+        self.transcript.refresh()
+        return self.propagate(self.buckets(course))
+
+    def buckets(self, course:str) -> list[str]:
+        # the credit and course count keys a college course counts towards
+        return [f"credits:{course.partition(' ')[0].upper()}", "credits:*"]
+
+    def set_exam(self, exam:str, score:float | str | None) -> dict[str, tuple[int, int]]:
+        if score is None:
+            self.transcript.exams.pop(exam, None)
+        else:
+            self.transcript.exams[exam] = score
+        self.transcript.refresh()
+        return self.propagate([leaf_key(ContentExam(exam))])  # type: ignore
+
+    def set_high_school(self, course:str, grade:int | str | None) -> dict[str, tuple[int, int]]:
+        if grade is None:
+            self.transcript.high_school.pop(course, None)
+        else:
+            self.transcript.high_school[course] = grade
+        self.transcript.refresh()
+        return self.propagate([leaf_key(ContentOtherCourse(course))])  # type: ignore
+
+
+if __name__ == "__main__":
+    catalog = load_catalog()
+    courses = [course for course, _ in catalog]
+    rng = random.Random(0)
+    transcript = random_transcript(catalog, rng)
+
+    start = time.perf_counter()
+    whatif = WhatIf(catalog, transcript)
+    print(f"Built per-node state for {len(whatif.values)} nodes in {(time.perf_counter() - start) * 1000:.1f}ms.")
+
+    # "what if" questions: apply an edit, compare with the tree walker from scratch, then undo it
+    edits = 2000
+    incremental = full = 0.0
+    flips = 0
+    for i in range(edits):
+        kind = rng.random()
+        if kind < 0.5:
+            course = rng.choice(courses)
+            edit, undo = whatif.set_grade, (course, transcript.courses.get(course))
+            args = (course, rng.choice(GRADES + ["S", None]))
+        elif kind < 0.6 and transcript.courses:
+            # credits and transferability only matter for courses on the transcript
+            course = rng.choice(list(transcript.courses))
+            if rng.random() < 0.5:
+                edit, undo = whatif.set_credits, (course, transcript.credits.get(course))
+                args = (course, rng.choice([None, 0, 1, 4, 15]))
+            else:
+                edit, undo = whatif.set_transferable, (course, course not in transcript.non_transferable)
+                args = (course, rng.random() < 0.3)
+        elif kind < 0.8:
+            course = rng.choice(courses)
+            edit, undo = whatif.set_in_progress, (course, course in transcript.in_progress)
+            args = (course, rng.random() < 0.5)
+        elif kind < 0.9:
+            exam = rng.choice(["LET", "MDT", "IELTS", "LPI"])
+            edit, undo = whatif.set_exam, (exam, transcript.exams.get(exam))
+            args = (exam, rng.choice([None, 2, 4, 6.5, 30, 80]))
+        else:
+            course = rng.choice(["English Studies 12", "Pre-calculus 12"])
+            edit, undo = whatif.set_high_school, (course, transcript.high_school.get(course))
+            args = (course, rng.choice([None, 55, 75, 95, "B"]))
+
+        start = time.perf_counter()
+        flipped = edit(*args)
+        incremental += time.perf_counter() - start
+        flips += len(flipped)
+
+        start = time.perf_counter()
+        expected = eligibility(transcript, catalog)
+        full += time.perf_counter() - start
+        assert whatif.status == expected, f"edit {i} disagrees with eligibility.py"
+        assert edit(*undo).keys() == flipped.keys(), f"undoing edit {i} didn't flip the same courses back"
+
+    print(f"{edits} random what-if edits flipped {flips} course results, matching eligibility.py every time.")
+    print(f"Incremental: {incremental / edits * 1e6:.1f}us per edit, "
+          f"re-evaluating the catalog: {full / edits * 1e6:.1f}us per edit ({full / incremental:.0f}x).")